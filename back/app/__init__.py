@@ -4,6 +4,7 @@ from flask_cors import CORS
 from app.analyse import checkin_blue
 from app.workbench import workbench_blue
 from app.advice import  advice_blue
+from app.analyse.SQLSession import db_init
 
 socketio = None
 
@@ -16,6 +17,8 @@ def create_app(config):
     CORS(app, supports_credentials=True)
     global socketio
     socketio = SocketIO(app)
+    # 初始化SQLSession使用的数据库引擎
+    db_init(config.DATABASE_URL)
 
     app.register_blueprint(workbench_blue, url_prefix='/workbench')  # 程序主界面，负责坐姿检测等逻辑
     app.register_blueprint(checkin_blue, url_prefix='/checkin')  # 数据分析与查看模块
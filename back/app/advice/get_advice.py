@@ -1,8 +1,10 @@
 from flask import Flask,make_response,json,jsonify,Blueprint,request
 from openai import OpenAI
-import mysql.connector
+from ..storage import get_storage
+from ..storage.Base import parse_day, day_bounds
+from ..analyse.PoseMask import MASK_WARNINGS, BAD_POSE_NAMES
 import datetime
-from datetime import date,datetime
+from datetime import date,datetime,timedelta
 import websockets
 import asyncio
 
@@ -17,7 +19,7 @@ advice_blue = Blueprint('advice', __name__)
 
 # 定义 Blueprint 中的路由
 @advice_blue.route('/realtime')
-def realtime_advice(bad_poses):
+def realtime_advice(bad_mask):
 
     print('开始生成警告')
 
@@ -25,72 +27,36 @@ def realtime_advice(bad_poses):
     current_time = datetime.now()
     formatted_time = current_time.strftime("%Y%m%d%H%M%S")
 
-    # 获取bad_poses字符串
-    str_bad_poses = ''
-    for bad_pose in bad_poses:
-        if bad_pose == 'head_left':
-            bad_pose = '头部左倾'
-        elif bad_pose == 'head_right':
-            bad_pose = '头部右倾'
-        elif bad_pose == 'hunchback':
-            bad_pose = '驼背'
-        elif bad_pose == 'chin_in_hands':
-            bad_pose = '托腮'
-        elif bad_pose == 'body_left':
-            bad_pose = '身体左倾'
-        elif bad_pose == 'body_right':
-            bad_pose = '身体右倾'
-        elif bad_pose == 'neck_forward':
-            bad_pose = '颈部前伸'
-        elif bad_pose == 'shoulder_left':
-            bad_pose = '左肩下沉'
-        elif bad_pose == 'shoulder_right':
-            bad_pose = '右肩下沉'
-        elif bad_pose == 'twisted_head':
-            bad_pose = '头部歪斜'
-        str_bad_poses += bad_pose + ','
-        # 去掉最后一个多余的逗号
-        str_bad_poses = str_bad_poses.rstrip(',')
-
     # 生成返回字典
     res = {
         "advice_id": f"advice_{formatted_time}",
         "timestamp": f"{datetime.now()}",
-        "warning": f'您{str_bad_poses},请改正',
+        # 提醒文字由不良坐姿掩码查表得到
+        "warning": MASK_WARNINGS[bad_mask],
     }
 
     print(res)
 
-    # 连接数据库
-    conn = mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="Hsj70750",
-        database="db1"
-    )
-    # 创建游标
-    cursor = conn.cursor()
-
-    # 执行添加
-    sql = "insert into suggestions(date,warning_content) values(%s,%s);"
-    # 获取当前日期
-    today = date.today()
-    # 获取年、月、日
-    year = today.year
-    month = today.month
-    day = today.day
-    values = (f"{year}年{month}月{day}日", res['warning'])
-    cursor.execute(sql, params=values)
-    # 提交
-    conn.commit()
-    # 执行查看
-    cursor.execute("SELECT * FROM suggestions;")
-    # 获取结果
-    result = cursor.fetchall()
-    print(result)
+    storage = get_storage()
+    # 执行添加，时间以整数时间戳保存
+    storage.insert_suggestion(int(current_time.timestamp()), res['warning'])
 
     return res
 
+WEEKDAY_NAMES = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
+
+
+def describe_bucket(bucket):
+    # 把 posture_trend 的一个汇总桶整理为提示词中的文字，例如“检测120次，不良坐姿30次：驼背20次（约5分钟）”
+    if bucket is None or not bucket['samples']:
+        return '无检测数据'
+    if not bucket['bad_samples']:
+        return f"检测{bucket['samples']}次，坐姿良好"
+    counts = sorted(((count, name) for name, count in bucket['counts'].items() if count), reverse=True)
+    parts = [f"{BAD_POSE_NAMES[name]}{count}次（约{round(bucket['durations'][name] / 60)}分钟）" for count, name in counts]
+    return f"检测{bucket['samples']}次，不良坐姿{bucket['bad_samples']}次：{'、'.join(parts)}"
+
+
 # 日总结路由
 @advice_blue.route('/daily_summary')
 def daily_advice():
@@ -115,19 +81,19 @@ def daily_advice():
     # 接受用户信息
     # query_date = '2025年3月3日'
     query_date = request.args.get('query_date')  # 获取 URL 参数 query_data 的值
-    # 连接数据库
-    conn = mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="Hsj70750",
-        database="db1"
-    )
-    # 创建游标
-    cursor = conn.cursor()
-    # 执行查询
-    cursor.execute(f"SELECT warning_content,advice_content FROM suggestions where date ='{query_date}';")
-    # 获取结果
-    info = cursor.fetchall()
+    # 读取当天的天汇总与小时汇总，最多 1 + 24 个桶，无需扫描原始记录
+    try:
+        day = parse_day(query_date)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    storage = get_storage()
+    start_ts, end_ts = day_bounds(day)
+    day_rows = storage.posture_trend('day', start_ts, end_ts)
+    hour_rows = storage.posture_trend('hour', start_ts, end_ts)
+    info = describe_bucket(day_rows[0] if day_rows else None)
+    if hour_rows:
+        hours = '；'.join(f"{datetime.fromtimestamp(row['bucket_ts']).hour}时{describe_bucket(row)}" for row in hour_rows)
+        info = f"{info}。各时段：{hours}"
 
     # 创建提示
     prompt = f'''
@@ -153,7 +119,7 @@ def daily_advice():
 
         "timestamp":  f"{datetime.now()}",
 
-        "title": f"{date}健康状况总结",
+        "title": f"{query_date}健康状况总结",
 
         "summary": f"{content['summary']}",
 
@@ -162,10 +128,6 @@ def daily_advice():
     }
     print(res)
 
-    # 关闭连接
-    cursor.close()
-    conn.close()
-
     # 返回JSON格式
     return jsonify(res)
 
@@ -192,10 +154,25 @@ def weekly_advice():
         return response.choices[0].message.content
 
 
+    # 本周（周一至周日）的天汇总，query_date 指定其他日期时统计该日期所在的周
+    query_date = request.args.get('query_date')
+    try:
+        day = parse_day(query_date) if query_date else date.today()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    monday = day - timedelta(days=day.weekday())
+    week = f"第{monday.isocalendar()[1]}周"
+    start_ts = day_bounds(monday)[0]
+    end_ts = day_bounds(monday + timedelta(days=6))[1]
+    day_rows = {datetime.fromtimestamp(row['bucket_ts']).date(): row
+                for row in get_storage().posture_trend('day', start_ts, end_ts)}
+    week_info = '，'.join(f"{WEEKDAY_NAMES[i]}{describe_bucket(day_rows.get(monday + timedelta(days=i)))}"
+                          for i in range(7))
+
     # 接受用户信息
     user_info = {
 
-       "week":"第十二周",
+       "week": week,
 
        "user_id": "user_001",
 
@@ -204,9 +181,6 @@ def weekly_advice():
        "language": "zh_CN"
     }
 
-    week = '第十二周'
-    week_info=('周一驼背,周二高低肩,周三前倾,周四坐姿良好,周五坐姿良好')
-
     # 创建提示
     prompt = f'''
                 你是一个办公室健康监测助手,负责根据用户每日坐姿数据生成相关总结报告并给出相关建议,
@@ -224,11 +198,11 @@ def weekly_advice():
     # 生成返回字典
     res = {
 
-    "weeklysum_id": "summary_20250226",
+    "weeklysum_id": f"summary_{monday:%Y%m%d}",
 
     "timestamp":  f"{datetime.now()}",
 
-    "title": f"2024年{week}健康状况总结",
+    "title": f"{monday.isocalendar()[0]}年{week}健康状况总结",
 
     "summary": f"{content['summary']}",
 
@@ -0,0 +1,40 @@
+import asyncio
+
+
+class AlertBroadcaster:
+    """
+    把一个生产者算出的提醒分发给所有已连接的 websocket 客户端。
+
+    每个客户端有自己的有界队列，publish 只把消息放入各队列、不等待发送，开销与客户端的网络状况无关；
+    队列已满（客户端接收过慢）时丢弃该客户端最旧的一条消息，保留最新的提醒。
+    除 metrics 外的方法都应在同一个事件循环中调用。
+    """
+
+    def __init__(self, queue_size):
+        self.queue_size = queue_size
+        self.clients = {}
+        self.stats = {'published': 0, 'dropped': 0, 'slow_disconnects': 0}
+
+    def subscribe(self, websocket):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.clients[websocket] = queue
+        return queue
+
+    def unsubscribe(self, websocket):
+        self.clients.pop(websocket, None)
+
+    def publish(self, message):
+        self.stats['published'] += 1
+        for queue in self.clients.values():
+            if queue.full():
+                queue.get_nowait()
+                self.stats['dropped'] += 1
+            queue.put_nowait(message)
+
+    def metrics(self):
+        # 由 Flask 线程调用，客户端可能同时连接或断开：先复制一份再遍历，避免“字典在迭代中改变大小”
+        queues = list(self.clients.values())
+        res = dict(self.stats)
+        res['clients'] = len(queues)
+        res['queued'] = sum(queue.qsize() for queue in queues)
+        return res
@@ -0,0 +1,183 @@
+"""
+坐姿历史的列式归档（Parquet）。按天分目录增量写入，分析时只读取需要的列和日期，不经过业务数据库。
+
+目录结构：
+    ARCHIVE_DIR/day=2025-03-03/part-<首个片段开始时间>-<id>.parquet
+    ARCHIVE_DIR/_state.json        已归档到的片段 id，{"id": 整数}
+已结束日期的多个 part 文件会合并为一个 data.parquet。
+
+依赖 pyarrow（可选），未安装时归档与读取会抛出 RuntimeError。
+
+用法（在 back 目录下）：
+    python -m app.analyse.Archive
+"""
+import json
+import os
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+from config import config
+from .PoseMask import BAD_POSES_LIST, masks_to_flags
+
+# 归档文件的列，与 posture_episode 一致
+ARCHIVE_COLUMNS = ('id', 'start_ts', 'end_ts', 'posture_mask', 'samples')
+STATE_FILE = '_state.json'
+COMPACT_FILE = 'data.parquet'
+
+
+def _require_pyarrow():
+    if pq is None:
+        raise RuntimeError("Parquet 归档需要安装 pyarrow")
+
+
+def _schema():
+    return pa.schema([('id', pa.int64()), ('start_ts', pa.int64()), ('end_ts', pa.int64()),
+                      ('posture_mask', pa.uint16()), ('samples', pa.uint32())])
+
+
+def _day_dir(archive_dir, day):
+    return os.path.join(archive_dir, f"day={day.isoformat()}")
+
+
+def _write_table(path, table):
+    # 先写临时文件再替换，读取方不会看到写了一半的文件
+    tmp_path = path + '.tmp'
+    pq.write_table(table, tmp_path, compression='zstd')
+    os.replace(tmp_path, path)
+
+
+def _load_state(archive_dir):
+    # 已归档到的片段 id，尚未归档过时为 0
+    path = os.path.join(archive_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return 0
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['id']
+
+
+def _save_state(archive_dir, last_id):
+    path = os.path.join(archive_dir, STATE_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({'id': last_id}, f)
+    os.replace(path + '.tmp', path)
+
+
+def archive_new(storage, archive_dir=None, batch=10000):
+    """
+    把上次归档之后新写入的坐姿片段按 id 顺序追加到归档，返回本次归档的片段数。
+
+    每批片段按日期各写一个 part 文件，文件名由该批在该日期的第一个片段决定，中途失败后重新运行会覆盖同名文件而不会重复归档；
+    晚写入的早期片段会写入对应日期的目录。今天之前有多个文件的日期随后合并为一个文件。
+    """
+    _require_pyarrow()
+    archive_dir = archive_dir or config.ARCHIVE_DIR
+    os.makedirs(archive_dir, exist_ok=True)
+    last_id = _load_state(archive_dir)
+    total = 0
+    while True:
+        rows = storage.episodes_after(last_id, batch)
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        by_day = {}
+        for row in rows:
+            by_day.setdefault(datetime.fromtimestamp(row[1]).date(), []).append(row)
+        for day, day_rows in by_day.items():
+            os.makedirs(_day_dir(archive_dir, day), exist_ok=True)
+            columns = list(zip(*day_rows))
+            table = pa.table({name: pa.array(column, type=_schema().field(name).type)
+                              for name, column in zip(ARCHIVE_COLUMNS, columns)})
+            _write_table(os.path.join(_day_dir(archive_dir, day), f"part-{day_rows[0][1]}-{day_rows[0][0]}.parquet"),
+                         table)
+        _save_state(archive_dir, last_id)
+        total += len(rows)
+
+    compact(archive_dir, before=date.today())
+    if total:
+        print(f"已归档 {total} 个坐姿片段")
+    return total
+
+
+def compact(archive_dir=None, before=None):
+    # 把 before 之前各日期目录下的多个文件合并为一个按开始时间排序的 data.parquet，按 id 去重
+    _require_pyarrow()
+    archive_dir = archive_dir or config.ARCHIVE_DIR
+    for name in sorted(os.listdir(archive_dir)):
+        if not name.startswith('day='):
+            continue
+        day = date.fromisoformat(name[4:])
+        if before is not None and day >= before:
+            continue
+        day_dir = os.path.join(archive_dir, name)
+        files = sorted(f for f in os.listdir(day_dir) if f.endswith('.parquet'))
+        if len(files) <= 1:
+            continue
+        table = pa.concat_tables([pq.read_table(os.path.join(day_dir, f), memory_map=True) for f in files])
+        _, first = np.unique(table['id'].to_numpy(), return_index=True)
+        table = table.take(pa.array(first)).sort_by('start_ts')
+        _write_table(os.path.join(day_dir, COMPACT_FILE), table)
+        for f in files:
+            if f != COMPACT_FILE:
+                os.remove(os.path.join(day_dir, f))
+
+
+def load_episodes(start_day, end_day, columns=None, archive_dir=None):
+    """
+    读取 [start_day, end_day] 的归档片段。只打开这些日期的目录，只解码 columns 指定的列，文件以内存映射方式读取。
+
+    返回值：
+    pyarrow.Table，列为 columns（默认全部 ARCHIVE_COLUMNS）。
+    """
+    _require_pyarrow()
+    archive_dir = archive_dir or config.ARCHIVE_DIR
+    columns = list(columns or ARCHIVE_COLUMNS)
+    tables = []
+    day = start_day
+    while day <= end_day:
+        day_dir = _day_dir(archive_dir, day)
+        if os.path.isdir(day_dir):
+            for name in sorted(os.listdir(day_dir)):
+                if name.endswith('.parquet'):
+                    tables.append(pq.read_table(os.path.join(day_dir, name), columns=columns, memory_map=True))
+        day += timedelta(days=1)
+    if not tables:
+        return _schema().empty_table().select(columns)
+    return pa.concat_tables(tables)
+
+
+def load_samples(start_day, end_day, archive_dir=None):
+    """
+    把 [start_day, end_day] 的归档片段还原为逐次检测样本（片段内等间隔分布，与 storage.Base.expand_episodes 一致），全程向量化。
+
+    返回值：
+    pd.DataFrame，列为 ts（秒级时间戳）、posture_mask，以及 BAD_POSES_LIST 中每种不良坐姿一列布尔值。
+    """
+    table = load_episodes(start_day, end_day, ['start_ts', 'end_ts', 'posture_mask', 'samples'], archive_dir)
+    start = table['start_ts'].to_numpy().astype(np.float64)
+    end = table['end_ts'].to_numpy().astype(np.float64)
+    n = table['samples'].to_numpy().astype(np.int64)
+
+    index = np.repeat(np.arange(len(n)), n)
+    # 每个样本在所属片段内的序号
+    offset = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+    step = (end - start) / np.maximum(n - 1, 1)
+    masks = table['posture_mask'].to_numpy().astype(np.uint16)[index]
+
+    df = pd.DataFrame({'ts': start[index] + offset * step[index], 'posture_mask': masks})
+    flags = masks_to_flags(masks)
+    for i, name in enumerate(BAD_POSES_LIST):
+        df[name] = flags[:, i]
+    return df
+
+
+if __name__ == '__main__':
+    from ..storage import get_storage
+    archive_new(get_storage())
@@ -0,0 +1,85 @@
+import asyncio
+import functools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from config import config
+
+# 供事件循环使用的数据库线程池，线程数即同时访问数据库的上限，不超过连接池大小
+_executor = ThreadPoolExecutor(max_workers=min(config.ASYNC_DB_WORKERS, config.DB_POOL_SIZE),
+                               thread_name_prefix='checkin-db')
+_stats_lock = threading.Lock()
+_stats = {'calls': 0, 'pending': 0, 'errors': 0, 'total_time': 0.0, 'max_time': 0.0}
+
+
+async def run_db(func, *args, **kwargs):
+    """
+    在专用线程池中执行阻塞的数据库调用（mysql.connector、SQLite 等），协程等待结果时事件循环继续处理其他连接。
+    """
+    loop = asyncio.get_running_loop()
+    with _stats_lock:
+        _stats['pending'] += 1
+    start = time.perf_counter()
+    try:
+        return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+    except Exception:
+        with _stats_lock:
+            _stats['errors'] += 1
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        with _stats_lock:
+            _stats['pending'] -= 1
+            _stats['calls'] += 1
+            _stats['total_time'] += elapsed
+            _stats['max_time'] = max(_stats['max_time'], elapsed)
+
+
+def db_executor_metrics():
+    with _stats_lock:
+        calls = _stats['calls']
+        return {
+            'db_calls': calls,
+            'db_pending': _stats['pending'],
+            'db_errors': _stats['errors'],
+            'db_avg_ms': round(_stats['total_time'] / calls * 1000, 3) if calls else 0.0,
+            'db_max_ms': round(_stats['max_time'] * 1000, 3),
+        }
+
+
+class LoopLagMonitor:
+    """
+    定期测量事件循环的延迟：每 interval 秒 sleep 一次，实际醒来时间比预期晚多少即为这段时间内循环被阻塞的时长。
+    """
+
+    def __init__(self, interval, history=600):
+        self.interval = interval
+        self.lags = deque(maxlen=history)
+        self.max_lag = 0.0
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            self.lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+    def metrics(self):
+        lags = sorted(self.lags)
+        if not lags:
+            return {'loop_lag_samples': 0}
+        return {
+            'loop_lag_samples': len(lags),
+            'loop_lag_last_ms': round(self.lags[-1] * 1000, 3),
+            'loop_lag_avg_ms': round(sum(lags) / len(lags) * 1000, 3),
+            'loop_lag_p99_ms': round(lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000, 3),
+            'loop_lag_max_ms': round(self.max_lag * 1000, 3),
+        }
+
+
+# websocket 服务的事件循环延迟
+loop_lag = LoopLagMonitor(config.LOOP_LAG_INTERVAL)
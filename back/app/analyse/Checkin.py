@@ -1,77 +1,202 @@
 import json
 import time
-from datetime import datetime
-from flask import Blueprint, Flask
-import mysql.connector
+from flask import Blueprint, Flask, jsonify, request
+from .DBPool import pool_metrics
+from .AsyncDB import run_db, db_executor_metrics, loop_lag
+from .AlertBroadcaster import AlertBroadcaster
+from .LiveStream import stream_live
+from .SQLSession import stream_rows, toNDJSON, toJSONStream
+from .PostureWindow import posture_window
+from .PoseMask import BAD_POSE_BITS, MASK_POSES
+from ..storage import get_storage
+from ..storage.Base import episodes_between_params, episodes_between_sql, expand_episodes
+from ..storage.Rollup import ROLLUP_PERIODS
+from config import config
 from websockets.asyncio.server import serve
+from websockets.exceptions import ConnectionClosed
 import asyncio
 
 app = Flask(__name__)
 checkin_blue = Blueprint('checkin', __name__)
 
-async def check_posture(websocket):
+# 趋势查询未指定 start 时默认的时间跨度（秒）
+TREND_DEFAULT_SPAN = {'minute': 3600, 'hour': 86400, 'day': 30 * 86400}
+
+# 与 [start_ts, end_ts] 有重叠的坐姿片段，与 storage.episodes_between 使用同一条 SQL
+HISTORY_SQL = episodes_between_sql(named=True)
+
+# 所有 websocket 连接共用的提醒分发器
+broadcaster = AlertBroadcaster(config.ALERT_CLIENT_QUEUE)
+
+def check_posture_db():
+    # 从 posture_episode 查询最近的检测，用于检测线程不在本进程中运行的情况；
+    # 尚未结束的片段还在检测进程内存中，最多滞后 ALERT_DB_EPISODE_SECONDS 秒加一个写入周期
+    storage = get_storage()
+
+    # 一次查询求出最近的检测中各不良坐姿的次数
+    round_trips = storage.round_trips
+    total_sums = storage.posture_window_sums(int(time.time()), config.ALERT_WINDOW_SIZE)
+    print(f"本次坐姿检查访问数据库 {storage.round_trips - round_trips} 次")
+
+    return sum(BAD_POSE_BITS[bad_pose] for bad_pose, total in total_sums.items() if total >= config.ALERT_THRESHOLD)
+
+
+async def produce_alerts():
+    # 唯一的提醒生产者：每个检查周期只判断一次、只调用一次 realtime_advice，结果分发给所有客户端
     print("坐姿检查已启动")
+    # 读取内存窗口的开销很小，可以频繁检查；从数据库查询时按提醒间隔检查
+    interval = config.ALERT_CHECK_INTERVAL if config.ALERT_SOURCE == 'memory' else config.ALERT_COOLDOWN
+    last_alert = None
+    last_version = None
     while True:
-        await asyncio.sleep(1)
-        # await websocket.send('hello client')
-        # print('Message sent')
-
-        bad_poses = []
-        bad_poses_list = ['head_left', 'head_right', 'hunchback', 'chin_in_hands', 'body_left', 'body_right',
-        'neck_forward', 'shoulder_left', 'shoulder_right', 'twisted_head']
-
-        await asyncio.sleep(30)
-
-        conn = mysql.connector.connect(
-                host="localhost",
-                user="root",
-                password="Hsj70750",
-                database="db1"
-            )
-
-        cursor = conn.cursor()
-
-        current_time = datetime.now()
-        formatted_time = current_time.strftime("%Y%m%d%H%M%S")
-
-        for i in range(10):
-
-            bad_pose = bad_poses_list[i]
-            check_sql = f"""
-                SELECT SUM({bad_pose}) AS total_sum
-                FROM (
-                    SELECT {bad_pose}
-                    FROM posture_log
-                    WHERE timestamp <= '{formatted_time}'
-                    ORDER BY timestamp DESC
-                    LIMIT 10
-                ) AS subquery
-            """
-            cursor.execute(check_sql)
-            result = cursor.fetchone()
-            total_sum = result[0] if result[0] is not None else 0
-
-            if total_sum >= 5:
-                bad_poses.append(bad_pose)
-
-        if bad_poses:
-            # 调用realtime_advice获取建议
-            from app.advice.get_advice import realtime_advice
-            advice_result = realtime_advice(bad_poses)
-            # 发送WebSocket消息
-            await websocket.send(json.dumps(advice_result,ensure_ascii=False))
-            print(f'已发送{advice_result}')
-
-        cursor.close()
-        conn.close()
+        await asyncio.sleep(interval)
+
+        # 没有客户端连接时不做检查，也不生成提醒记录
+        if not broadcaster.clients:
+            continue
+
+        # 距上次提醒不足 ALERT_COOLDOWN 秒时不重复提醒
+        if last_alert is not None and time.monotonic() - last_alert < config.ALERT_COOLDOWN:
+            continue
+
+        try:
+            if config.ALERT_SOURCE == 'memory':
+                version = posture_window.version
+                # 窗口没有新样本时无需重新判断
+                if version == last_version:
+                    continue
+                last_version = version
+                bad_mask = posture_window.alert_mask(config.ALERT_THRESHOLD)
+            else:
+                # 数据库查询在线程池中执行，不阻塞事件循环中的其他连接
+                bad_mask = await run_db(check_posture_db)
+
+            if bad_mask:
+                last_alert = time.monotonic()
+                # 调用realtime_advice获取建议（其中写入提醒记录，同样放到线程池中执行）
+                from app.advice.get_advice import realtime_advice
+                advice_result = await run_db(realtime_advice, bad_mask)
+                broadcaster.publish(json.dumps(advice_result,ensure_ascii=False))
+                print(f'已发送{advice_result}')
+        except Exception as e:
+            print(f"坐姿检查出错: {str(e)}")
+
+
+async def check_posture(websocket):
+    # 每个连接只负责把自己队列中的提醒发出去；发送超过 ALERT_SEND_TIMEOUT 秒的慢客户端会被断开
+    queue = broadcaster.subscribe(websocket)
+    # 客户端断开时立即退订，不必等到下一条提醒发送失败
+    closed = asyncio.ensure_future(websocket.wait_closed())
+    try:
+        while True:
+            getter = asyncio.ensure_future(queue.get())
+            await asyncio.wait({getter, closed}, return_when=asyncio.FIRST_COMPLETED)
+            if not getter.done():
+                getter.cancel()
+                return
+            try:
+                await asyncio.wait_for(websocket.send(getter.result()), config.ALERT_SEND_TIMEOUT)
+            except asyncio.TimeoutError:
+                broadcaster.stats['slow_disconnects'] += 1
+                await websocket.close(1008, 'slow consumer')
+                return
+            except ConnectionClosed:
+                return
+    finally:
+        closed.cancel()
+        broadcaster.unsubscribe(websocket)
+
+
+async def handle_connection(websocket):
+    # ws://host:8765/live 为实时关键点二进制推送，其他路径为坐姿提醒
+    if websocket.request.path.startswith('/live'):
+        await stream_live(websocket)
+    else:
+        await check_posture(websocket)
 
 
 async def start_websocket_server():
-    async with serve(check_posture, "localhost", 8765,ping_interval=None) as server:
+    # 持续测量事件循环延迟，由 /checkin/db_metrics 查看
+    lag_task = asyncio.create_task(loop_lag.run())
+    producer = asyncio.create_task(produce_alerts())
+    async with serve(handle_connection, "localhost", 8765,ping_interval=None) as server:
         print("WebSocket服务器已启动在 ws:// 0.0.0.0:8765")
         await server.serve_forever()
+    producer.cancel()
+    lag_task.cancel()
 
 @checkin_blue.route('/')
 def start_server():
     with app.app_context():
-        asyncio.run(start_websocket_server())
\ No newline at end of file
+        asyncio.run(start_websocket_server())
+
+# 数据库连接池统计信息
+@checkin_blue.route('/db_metrics')
+def db_metrics():
+    res = pool_metrics()
+    res['round_trips'] = get_storage().round_trips
+    # websocket 服务的数据库线程池与事件循环延迟
+    res.update(db_executor_metrics())
+    res.update(loop_lag.metrics())
+    return jsonify(res)
+
+# 坐姿趋势：按分钟/小时/天汇总的各不良坐姿次数与时长，只读取汇总表
+# 参数 period（minute/hour/day，默认 hour）、start、end（秒级时间戳，默认截至当前）
+@checkin_blue.route('/trend')
+def trend():
+    period = request.args.get('period', 'hour')
+    if period not in ROLLUP_PERIODS:
+        return jsonify({'error': f'未知的汇总粒度: {period}'}), 400
+    end_ts = request.args.get('end', type=int) or int(time.time()) + 1
+    start_ts = request.args.get('start', type=int) or end_ts - TREND_DEFAULT_SPAN[period]
+    buckets = get_storage().posture_trend(period, start_ts, end_ts)
+    return jsonify({'period': period, 'start': start_ts, 'end': end_ts, 'buckets': buckets})
+
+
+def _history_params():
+    # start、end 为秒级时间戳，默认最近 24 小时
+    end_ts = request.args.get('end', type=int) or int(time.time()) + 1
+    start_ts = request.args.get('start', type=int) or end_ts - 86400
+    return episodes_between_params(start_ts, end_ts)
+
+
+def _stream_response(batches):
+    # format=json 返回分块传输的 JSON 数组，默认返回 NDJSON
+    if request.args.get('format') == 'json':
+        return toJSONStream(batches)
+    return toNDJSON(batches)
+
+
+# 坐姿历史：按时间顺序流式返回坐姿片段，服务端游标逐批读取，内存占用与时间范围无关
+@checkin_blue.route('/history')
+def history():
+    params = _history_params()
+
+    def batches():
+        for batch in stream_rows(HISTORY_SQL, params):
+            for row in batch:
+                row['poses'] = MASK_POSES[row['posture_mask']]
+            yield batch
+
+    return _stream_response(batches())
+
+
+# 坐姿导出：把坐姿片段还原为逐次检测样本后流式返回
+@checkin_blue.route('/export')
+def export():
+    params = _history_params()
+
+    def batches():
+        for batch in stream_rows(HISTORY_SQL, params):
+            episodes = [(row['start_ts'], row['end_ts'], row['posture_mask'], row['samples']) for row in batch]
+            timestamps, masks = expand_episodes(episodes, params['start_ts'], params['end_ts'])
+            yield [{'ts': round(ts, 3), 'posture_mask': mask, 'poses': MASK_POSES[mask]}
+                   for ts, mask in zip(timestamps.tolist(), masks.tolist())]
+
+    return _stream_response(batches())
+
+
+# 提醒分发统计：客户端数、排队与丢弃的消息数
+@checkin_blue.route('/alert_metrics')
+def alert_metrics():
+    return jsonify(broadcaster.metrics())
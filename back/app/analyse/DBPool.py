@@ -0,0 +1,110 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from mysql.connector import pooling, errors
+
+from config import config
+
+# MySQL连接池，首次使用时按配置创建
+_pool = None
+# 限制同时借出的连接数，连接池耗尽时排队等待而不是直接报错
+_slots = None
+_lock = threading.Lock()
+# 各连接最近一次归还的时间，用于判断是否需要健康检查
+_last_used = {}
+
+# 连接池统计信息，等待时间单位为秒
+_metrics = {
+    'checkouts': 0,
+    'timeouts': 0,
+    'reconnects': 0,
+    'total_wait': 0.0,
+    'max_wait': 0.0,
+}
+
+
+def pool_init(**overrides):
+    """
+    按配置创建共享的MySQL连接池，重复调用不会重复创建。
+
+    参数：
+    overrides：关键字参数
+        覆盖 config 中的连接参数，例如 pool_size=8。
+    """
+    global _pool, _slots
+    with _lock:
+        if _pool is not None:
+            return _pool
+        settings = {
+            'host': config.DB_HOST,
+            'port': config.DB_PORT,
+            'user': config.DB_USER,
+            'password': config.DB_PASSWORD,
+            'database': config.DB_NAME,
+            'pool_size': config.DB_POOL_SIZE,
+        }
+        settings.update(overrides)
+        # mysql.connector 的连接池上限为 CNX_POOL_MAXSIZE
+        settings['pool_size'] = max(1, min(settings['pool_size'], pooling.CNX_POOL_MAXSIZE))
+        _pool = pooling.MySQLConnectionPool(pool_name='poseguard', pool_reset_session=True, **settings)
+        _slots = threading.BoundedSemaphore(settings['pool_size'])
+        print(f"数据库连接池已创建，大小为 {settings['pool_size']}")
+        return _pool
+
+
+def record_wait(wait):
+    # 记录一次借出连接的等待时间，SQLSession 也通过它上报
+    with _lock:
+        _metrics['checkouts'] += 1
+        _metrics['total_wait'] += wait
+        _metrics['max_wait'] = max(_metrics['max_wait'], wait)
+
+
+def pool_metrics():
+    # 返回连接池统计信息的快照
+    with _lock:
+        res = dict(_metrics)
+    res['avg_wait'] = res['total_wait'] / res['checkouts'] if res['checkouts'] else 0.0
+    res['pool_size'] = _pool.pool_size if _pool is not None else 0
+    return res
+
+
+def _health_check(conn):
+    # 空闲超过 DB_POOL_PING_INTERVAL 的连接在借出前先 ping，断开时自动重连
+    last_used = _last_used.get(conn.connection_id)
+    if last_used is not None and time.monotonic() - last_used < config.DB_POOL_PING_INTERVAL:
+        return
+    try:
+        conn.ping(reconnect=False)
+    except errors.Error:
+        conn.ping(reconnect=True, attempts=3, delay=0.2)
+        with _lock:
+            _metrics['reconnects'] += 1
+
+
+@contextmanager
+def get_connection():
+    """
+    从连接池借出一个连接，退出上下文时归还。
+
+    连接池耗尽时最多等待 DB_POOL_TIMEOUT 秒，超时抛出 mysql.connector.errors.PoolError。
+    """
+    pool = pool_init()
+    start = time.perf_counter()
+    if not _slots.acquire(timeout=config.DB_POOL_TIMEOUT):
+        with _lock:
+            _metrics['timeouts'] += 1
+        raise errors.PoolError(f"等待数据库连接超时（{config.DB_POOL_TIMEOUT}秒）")
+    try:
+        conn = pool.get_connection()
+        record_wait(time.perf_counter() - start)
+        try:
+            _health_check(conn)
+            yield conn
+        finally:
+            _last_used[conn.connection_id] = time.monotonic()
+            # 对连接池中的连接调用 close 会将其归还到连接池
+            conn.close()
+    finally:
+        _slots.release()
@@ -0,0 +1,128 @@
+"""
+实时关键点二进制推送。
+
+检测线程每判定一帧调用 live_frames.publish，websocket 连接 ws://host:8765/live 的客户端收到二进制消息
+（小端序），格式如下：
+
+    关键帧 type=1：type u8 | seq u16 | ts_ms u32 | mask u16 | present u16 | 每个存在的关键点 (x i16, y i16)
+    差分帧 type=2：type u8 | seq u16 | ts_ms u32 | mask u16 | present u16 | changed u16 | 每个变化的关键点 (dx i8, dy i8)
+
+坐标按 1/LIVE_QUANT_SCALE 像素量化；关键点顺序与 JudgePoseBatch.KEYPOINT_NAMES 一致，
+present / changed 的第 i 位对应第 i 个关键点；ts_ms 为连接建立后的毫秒数；mask 为不良坐姿掩码（见 PoseMask）。
+差分帧相对上一条消息的坐标，关键点出现或消失、位移超出 int8 范围或每隔 LIVE_KEYFRAME_INTERVAL 帧时发送关键帧。
+前端解码见 front/services/websocket_service.dart 中的 LiveFrameDecoder。
+"""
+import asyncio
+import struct
+import threading
+import time
+
+import numpy as np
+
+from websockets.exceptions import ConnectionClosed
+
+from config import config
+
+FRAME_KEY = 1
+FRAME_DELTA = 2
+_KEY_HEADER = struct.Struct('<BHIHH')
+_DELTA_HEADER = struct.Struct('<BHIHHH')
+
+
+class LiveFrames:
+    """
+    检测线程与 websocket 推送之间的最新帧缓存，只保留最新的一帧，推送跟不上时旧帧直接被覆盖。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = 0
+        self.frame = None
+
+    def publish(self, points, mask):
+        # points 为 (P, 2) 的关键点坐标数组，缺失为 NaN，顺序与 JudgePoseBatch.KEYPOINT_NAMES 一致
+        with self.lock:
+            self.version += 1
+            self.frame = (self.version, time.monotonic(), points, mask)
+
+    def latest(self):
+        with self.lock:
+            return self.frame
+
+
+class LiveEncoder:
+    """
+    单个连接的编码状态：记住上一条消息的量化坐标，后续帧只发送变化的关键点。
+    """
+
+    def __init__(self, scale, keyframe_interval):
+        self.scale = scale
+        self.keyframe_interval = keyframe_interval
+        self.seq = 0
+        self.start = time.monotonic()
+        self.prev = None
+        self.since_key = 0
+
+    def encode(self, points, mask, ts):
+        present = ~np.isnan(points).any(axis=1)
+        quantized = np.zeros(points.shape, dtype=np.int64)
+        quantized[present] = np.rint(points[present] * self.scale)
+        np.clip(quantized, -32767, 32767, out=quantized)
+        present_bits = int(sum(1 << i for i in np.flatnonzero(present)))
+        ts_ms = int(max(0.0, ts - self.start) * 1000) & 0xFFFFFFFF
+        seq = self.seq & 0xFFFF
+        self.seq += 1
+
+        if self.prev is not None and self.since_key < self.keyframe_interval:
+            prev_quantized, prev_bits = self.prev
+            delta = quantized - prev_quantized
+            if prev_bits == present_bits and np.abs(delta[present]).max(initial=0) <= 127:
+                changed = present & (delta != 0).any(axis=1)
+                changed_bits = int(sum(1 << i for i in np.flatnonzero(changed)))
+                self.prev = (quantized, present_bits)
+                self.since_key += 1
+                return _DELTA_HEADER.pack(FRAME_DELTA, seq, ts_ms, mask, present_bits, changed_bits) + \
+                    delta[changed].astype('<i1').tobytes()
+
+        self.prev = (quantized, present_bits)
+        self.since_key = 0
+        return _KEY_HEADER.pack(FRAME_KEY, seq, ts_ms, mask, present_bits) + quantized[present].astype('<i2').tobytes()
+
+
+async def stream_live(websocket):
+    """
+    向一个客户端推送最新帧。发送耗时超过当前间隔的一半（客户端或网络跟不上）时把发送间隔加倍，
+    发送顺畅时逐步缩短，间隔在 [LIVE_MIN_INTERVAL, LIVE_MAX_INTERVAL] 之间；跳过的帧不会补发。
+    """
+    encoder = LiveEncoder(config.LIVE_QUANT_SCALE, config.LIVE_KEYFRAME_INTERVAL)
+    interval = config.LIVE_MIN_INTERVAL
+    last_version = None
+    # 没有新帧（检测停止或座位无人）时不会发送，需要单独等待断开，否则断开的连接会一直空转
+    closed = asyncio.ensure_future(websocket.wait_closed())
+    try:
+        while True:
+            await asyncio.wait({closed}, timeout=interval)
+            if closed.done():
+                return
+            frame = live_frames.latest()
+            if frame is None or frame[0] == last_version:
+                continue
+            version, ts, points, mask = frame
+            last_version = version
+
+            start = time.monotonic()
+            try:
+                await websocket.send(encoder.encode(points, mask, ts))
+            except ConnectionClosed:
+                return
+            elapsed = time.monotonic() - start
+            if elapsed > interval / 2:
+                interval = min(interval * 2, config.LIVE_MAX_INTERVAL)
+            else:
+                interval = max(interval * 0.9, config.LIVE_MIN_INTERVAL)
+    finally:
+        closed.cancel()
+
+
+# 检测线程发布、websocket 推送读取的最新帧
+live_frames = LiveFrames()
@@ -0,0 +1,59 @@
+import numpy as np
+
+# 不良坐姿类型，第 i 种坐姿对应掩码的第 i 位
+BAD_POSES_LIST = ['head_left', 'head_right', 'hunchback', 'chin_in_hands', 'body_left', 'body_right',
+                  'neck_forward', 'shoulder_left', 'shoulder_right', 'twisted_head']
+BAD_POSE_BITS = {name: 1 << i for i, name in enumerate(BAD_POSES_LIST)}
+
+# 提醒中使用的中文名称
+BAD_POSE_NAMES = {
+    'head_left': '头部左倾',
+    'head_right': '头部右倾',
+    'hunchback': '驼背',
+    'chin_in_hands': '托腮',
+    'body_left': '身体左倾',
+    'body_right': '身体右倾',
+    'neck_forward': '颈部前伸',
+    'shoulder_left': '左肩下沉',
+    'shoulder_right': '右肩下沉',
+    'twisted_head': '头部歪斜',
+}
+
+MASK_COUNT = 1 << len(BAD_POSES_LIST)
+# 各位的权重，用于把 (N, 10) 的布尔数组转换为掩码
+MASK_WEIGHTS = np.array([1 << i for i in range(len(BAD_POSES_LIST))], dtype=np.uint16)
+
+# 预先计算的查找表：掩码 → 置位的下标、坐姿名称、提醒文字、置位个数
+MASK_BITS = [tuple(i for i in range(len(BAD_POSES_LIST)) if mask >> i & 1) for mask in range(MASK_COUNT)]
+MASK_POSES = [[BAD_POSES_LIST[i] for i in bits] for bits in MASK_BITS]
+MASK_WARNINGS = [f"您{'、'.join(BAD_POSE_NAMES[name] for name in poses)},请改正" for poses in MASK_POSES]
+MASK_POPCOUNT = np.array([len(bits) for bits in MASK_BITS], dtype=np.uint8)
+
+
+def poses_to_mask(bad_poses):
+    # 不良坐姿名称列表 → 掩码
+    mask = 0
+    for name in bad_poses:
+        mask |= BAD_POSE_BITS[name]
+    return mask
+
+
+def mask_to_poses(mask):
+    # 掩码 → 不良坐姿名称列表（按 BAD_POSES_LIST 顺序）
+    return MASK_POSES[mask]
+
+
+def flags_to_masks(flags):
+    # (N, 10) 的布尔数组 → 长度 N 的 uint16 掩码数组
+    return (np.asarray(flags, dtype=np.uint16) * MASK_WEIGHTS).sum(axis=1, dtype=np.uint16)
+
+
+def masks_to_flags(masks):
+    # 长度 N 的掩码数组 → (N, 10) 的布尔数组
+    masks = np.asarray(masks, dtype=np.uint16)
+    return (masks[:, None] & MASK_WEIGHTS) != 0
+
+
+def mask_counts(masks):
+    # 统计一组掩码中各不良坐姿出现的次数，返回长度 10 的整数数组
+    return masks_to_flags(masks).sum(axis=0)
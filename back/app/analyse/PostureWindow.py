@@ -0,0 +1,56 @@
+import threading
+from collections import deque
+
+from config import config
+from .PoseMask import BAD_POSES_LIST, MASK_BITS
+
+
+class PostureWindow:
+    """
+    最近 size 次检测结果的滑动窗口，按不良坐姿类型维护出现次数。
+
+    检测线程每次判定后调用 add 传入不良坐姿掩码，新样本计入、最旧的样本移出，
+    只需遍历两个掩码中置位的位，每次更新为 O(1)；坐姿检查直接读取窗口内的计数，不再经由数据库。
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.masks = deque()
+        self.counts = [0] * len(BAD_POSES_LIST)
+        # 每加入一个样本加一，读取方据此判断是否有新数据
+        self.version = 0
+        self.lock = threading.Lock()
+
+    def add(self, mask):
+        # mask 为 judge_pose 返回的不良坐姿掩码，良好坐姿为 0
+        with self.lock:
+            self.masks.append(mask)
+            for i in MASK_BITS[mask]:
+                self.counts[i] += 1
+            if len(self.masks) > self.size:
+                for i in MASK_BITS[self.masks.popleft()]:
+                    self.counts[i] -= 1
+            self.version += 1
+
+    def clear(self):
+        with self.lock:
+            self.masks.clear()
+            self.counts = [0] * len(BAD_POSES_LIST)
+            self.version += 1
+
+    def __len__(self):
+        return len(self.masks)
+
+    def snapshot(self):
+        # 返回 (version, 样本数, {不良坐姿: 次数})
+        with self.lock:
+            return self.version, len(self.masks), dict(zip(BAD_POSES_LIST, self.counts))
+
+    def alert_mask(self, threshold):
+        # 窗口内出现次数不少于 threshold 的不良坐姿组成的掩码
+        with self.lock:
+            return sum(1 << i for i, count in enumerate(self.counts) if count >= threshold)
+
+
+# 检测线程与坐姿检查共用的窗口
+posture_window = PostureWindow(config.ALERT_WINDOW_SIZE)
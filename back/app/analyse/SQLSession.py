@@ -1,9 +1,13 @@
+import json
+import time
 from contextlib import contextmanager
 
 import pandas as pd
-from flask import jsonify
-from sqlalchemy import create_engine
+from flask import jsonify, Response
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
+from config import config
+from .DBPool import record_wait
 # 数据库引擎
 engine = None
 # 会话工程
@@ -13,8 +17,9 @@ Session = None
 def db_init(db_url):
     global engine, Session
     if engine is None:
-        # 创建数据库引擎
-        engine = create_engine(db_url)
+        # 创建数据库引擎，连接池大小、等待超时与MySQL连接池使用同一套配置，借出前检查连接是否可用
+        engine = create_engine(db_url, pool_size=config.DB_POOL_SIZE, max_overflow=0,
+                               pool_timeout=config.DB_POOL_TIMEOUT, pool_pre_ping=True)
         # 创建会话工厂
         Session = sessionmaker(bind=engine)
 
@@ -25,7 +30,10 @@ def get_session():
         raise Exception("Database not initialized. Call db_init() first.")
     session = Session()
     try:
-        # 创建会话
+        # 创建会话，并把从连接池借出连接的等待时间计入连接池统计
+        start = time.perf_counter()
+        session.connection()
+        record_wait(time.perf_counter() - start)
         yield session
     finally:
         # 关闭会话
@@ -38,8 +46,42 @@ def toJSON(res):
     json_res = jsonify(res)
     return json_res
 
-# 数据库结果转dataframe工具函数
+# 数据库结果转dataframe工具函数，直接由行元组和列名构造，不为每行创建字典
 def toDataFrame(res):
-    data = [row._asdict() for row in res]
-    df = pd.DataFrame(data)
+    df = pd.DataFrame(res.fetchall(), columns=list(res.keys()))
     return df
+
+
+# 流式查询：使用服务端游标，每次从数据库取 batch_size 行，逐批产出字典列表，内存占用与结果总行数无关
+def stream_rows(sql, params=None, batch_size=None):
+    batch_size = batch_size or config.STREAM_BATCH_SIZE
+    with get_session() as session:
+        res = session.execute(text(sql), params or {},
+                              execution_options={'stream_results': True, 'yield_per': batch_size})
+        keys = list(res.keys())
+        for partition in res.partitions():
+            yield [dict(zip(keys, row)) for row in partition]
+
+
+# 逐批结果转 NDJSON 流式响应，每行一个 JSON 对象，每批作为一个分块发送
+def toNDJSON(batches):
+    def generate():
+        for batch in batches:
+            if batch:
+                yield ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in batch)
+    return Response(generate(), mimetype='application/x-ndjson')
+
+
+# 逐批结果转 JSON 数组流式响应（分块传输），客户端收到的是一个完整的 JSON 数组
+def toJSONStream(batches):
+    def generate():
+        yield '['
+        first = True
+        for batch in batches:
+            if not batch:
+                continue
+            chunk = ','.join(json.dumps(row, ensure_ascii=False) for row in batch)
+            yield chunk if first else ',' + chunk
+            first = False
+        yield ']'
+    return Response(generate(), mimetype='application/json')
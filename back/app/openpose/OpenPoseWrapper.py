@@ -1,63 +1,97 @@
 # pose_detection/OpenPoseWrapper.py
 import cv2
 import os
-import time
+import numpy as np
 # from PyOpenPose.src.body import models
 from .body import Body
+from .hand import Hand
 
 keyPoints = {}
 
 class OpenPoseWrapperclass:
-    def __init__(self):
+    def __init__(self, camera_index=0, hand_model_path=None, hand_options=None, capture_size=(128, 96),
+                 input_height=184):
         # 获取当前文件所在目录
         current_dir = os.path.dirname(os.path.abspath(__file__))
         # 构建相对路径
         model_path = 'body_pose_model.pth'
         # 使用相对路径构建绝对路径
         model_path = os.path.join(current_dir, model_path)
-        self.body_estimation = Body(model_path)
+        self.body_estimation = Body(model_path, input_height)
         # self.body_estimation = Body('./PyOpenPose/openpose/models/body_pose_model.pth')
-        self.cap = cv2.VideoCapture(0)
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 128)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 96)
+        # 手部检测为可选阶段，未提供模型文件时不启用
+        self.hand_estimation = None
+        if hand_model_path:
+            if os.path.exists(hand_model_path):
+                self.hand_estimation = Hand(hand_model_path, **(hand_options or {}))
+            else:
+                print(f"未找到手部模型 {hand_model_path}，不启用手部检测")
+        self.cap = cv2.VideoCapture(camera_index)
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, capture_size[0])
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, capture_size[1])
         self.numberToWord = ['nose', 'neck', 'right_shoulder', '', 'left_wrist', 'left_shoulder', '', 'right_wrist', '', '', '', '',
                 '', '', 'right_eye', 'left_eye', '', '']
+        # 手部关键点的名称，与同侧手腕在 numberToWord 中的名称一致（handDetect 的左手对应编号 7 的手腕）
+        self.handToWord = {True: 'right_hand', False: 'left_hand'}
 
-    def get_standard_pose(self, cap, numberToWord, num_samples):
-        standard_poses = {}
+    def to_keypoints(self, candidate, subset):
+        # 第一个人的身体关键点，{名称: [x, y]}，只包含 numberToWord 中有名称且检测到的关键点
+        keyPoints = {}
+        if len(subset) > 0:
+            for i in range(18):
+                index = int(subset[0][i])
+                if index == -1 or self.numberToWord[i] == '':
+                    continue
+                x, y = candidate[index][0:2]
+                keyPoints[self.numberToWord[i]] = [x, y]
+        return keyPoints
+
+    def get_standard_pose(self, cap, numberToWord, num_samples, trim=0.2, min_ratio=0.5):
+        """
+        连续采集 num_samples 帧（不再逐帧等待），用截尾均值估计每个关键点的标准位置。
+
+        参数：
+        cap：摄像头
+        numberToWord：列表
+            关键点编号到名称的映射。
+        num_samples：整数
+            采样帧数。
+        trim：浮点数
+            截尾均值每一端去掉的比例，样本过少时退化为中位数。
+        min_ratio：浮点数
+            关键点至少在该比例的帧中被检测到才计入标准坐姿，避免偶发的误检。
+
+        返回值：
+        字典
+            {关键点名称: [x, y]}，均值只在检测到该关键点的帧上计算。
+        """
+        samples = {}
 
         for sample_count in range(num_samples):
-            keyPoints = {}
             ret, oriImg = cap.read()
+            if not ret:
+                continue
             candidate, subset = self.body_estimation(oriImg)
 
             if len(subset) > 0:
                 for i in range(18):
                     index = int(subset[0][i])
-                    if index == -1:
+                    if index == -1 or numberToWord[i] == '':
                         continue
-                    x, y = candidate[index][0:2]
-                    if numberToWord[i] != '':
-                        if numberToWord[i] not in keyPoints:
-                            keyPoints[numberToWord[i]] = []
-                        keyPoints[numberToWord[i]].append([x, y])
-
-            # 打印或存储每个采样的中间关键点，如果需要的话
-            print(f"第 {sample_count + 1} 次采样: {keyPoints}")
-
-            # 等待一秒
-            time.sleep(1)
-
-            # 累积用于平均的关键点
-            for key, values in keyPoints.items():
-                if key not in standard_poses:
-                    standard_poses[key] = []
-                standard_poses[key].extend(values)
-
-        # 计算每个关键点的平均值
-        for key, values in standard_poses.items():
-            average_x = sum(point[0] for point in values) / num_samples
-            average_y = sum(point[1] for point in values) / num_samples
-            standard_poses[key] = [average_x, average_y]
+                    samples.setdefault(numberToWord[i], []).append(candidate[index][0:2])
+
+        min_count = max(1, int(np.ceil(num_samples * min_ratio)))
+        standard_poses = {}
+        for key, values in samples.items():
+            if len(values) < min_count:
+                continue
+            values = np.sort(np.asarray(values, dtype=np.float64), axis=0)
+            k = int(len(values) * trim)
+            if len(values) - 2 * k < 1:
+                point = np.median(values, axis=0)
+            else:
+                point = values[k:len(values) - k].mean(axis=0)
+            standard_poses[key] = [float(point[0]), float(point[1])]
 
+        print(f"标定完成，共 {num_samples} 帧: {standard_poses}")
         return standard_poses
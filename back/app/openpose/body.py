@@ -10,37 +10,67 @@ import torch
 
 from . import util
 from . import model
+from .preprocess import InputBuffer
 # os.environ["CUDA_VISIBLE_DEVICES"]="1"
 
 class Body(object):
-    def __init__(self, model_path):
+    def __init__(self, model_path, input_height=184):
         self.model = model.bodypose_model()
         if torch.cuda.is_available():
             self.model = self.model.cuda()
         model_dict = util.transfer(self.model, torch.load(model_path))
         self.model.load_state_dict(model_dict)
         self.model.eval()
+        # 网络输入高度（像素），帧按该高度等比缩放；默认 184 即原来的 boxsize=368、scale 0.5
+        self.input_height = input_height
+        # 网络输入缓冲区，同一尺寸的帧重复使用
+        self.input_buffer = InputBuffer(stride=8, padValue=128)
+        # 全分辨率的热图与 PAF 累加缓冲区，按帧尺寸缓存
+        self.accumulators = {}
+
+    def _accumulators(self, shape, multi_scale):
+        # 返回 float32 的 [heatmap_avg, paf_avg, heatmap_tmp, paf_tmp]，后两个只在多尺度时用于暂存其余尺度的结果
+        key = (shape[0], shape[1], multi_scale)
+        if key not in self.accumulators:
+            h, w = shape[0], shape[1]
+            buffers = [np.empty((h, w, 19), dtype=np.float32), np.empty((h, w, 38), dtype=np.float32)]
+            if multi_scale:
+                buffers += [np.empty((h, w, 19), dtype=np.float32), np.empty((h, w, 38), dtype=np.float32)]
+            else:
+                buffers += [None, None]
+            self.accumulators[key] = buffers
+        return self.accumulators[key]
+
+    def presence(self, oriImg, input_height):
+        """
+        画面中是否有人的快速估计：按 input_height 缩小画面，只计算主干网络与第一阶段的热图，返回脖子热图的峰值。
+        """
+        im, (h, w) = self.input_buffer(oriImg, input_height / oriImg.shape[0])
+        data = torch.from_numpy(im)
+        if torch.cuda.is_available():
+            data = data.cuda()
+        with torch.no_grad():
+            heatmaps = self.model.stage1_heatmaps(data)
+        # 通道 1 为脖子，只取未填充的区域
+        return float(heatmaps[0, 1, :-(-h // 8), :-(-w // 8)].max())
 
     def __call__(self, oriImg):
         # scale_search = [0.5, 1.0, 1.5, 2.0]
         scale_search = [0.5]
-        boxsize = 368
+        boxsize = self.input_height * 2
         stride = 8
-        padValue = 128
         thre1 = 0.1
         thre2 = 0.05
         multiplier = [x * boxsize / oriImg.shape[0] for x in scale_search]
-        heatmap_avg = np.zeros((oriImg.shape[0], oriImg.shape[1], 19))
-        paf_avg = np.zeros((oriImg.shape[0], oriImg.shape[1], 38))
+        # 第一个尺度的结果直接缩放进累加缓冲区，其余尺度缩放进暂存缓冲区后累加，最后除以尺度数
+        heatmap_avg, paf_avg, heatmap_tmp, paf_tmp = self._accumulators(oriImg.shape, len(multiplier) > 1)
 
         for m in range(len(multiplier)):
             scale = multiplier[m]
-            imageToTest = cv2.resize(oriImg, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
-            imageToTest_padded, pad = util.padRightDownCorner(imageToTest, stride, padValue)
-            im = np.transpose(np.float32(imageToTest_padded[:, :, :, np.newaxis]), (3, 2, 0, 1)) / 256 - 0.5
-            im = np.ascontiguousarray(im)
+            # 缩放、填充与归一化直接写入复用的输入缓冲区，(h, w) 为填充前的尺寸
+            im, (h, w) = self.input_buffer(oriImg, scale)
 
-            data = torch.from_numpy(im).float()
+            data = torch.from_numpy(im)
             if torch.cuda.is_available():
                 data = data.cuda()
             # data = data.permute([2, 0, 1]).unsqueeze(0).float()
@@ -53,17 +83,24 @@ class Body(object):
             # heatmap = np.transpose(np.squeeze(net.blobs[output_blobs.keys()[1]].data), (1, 2, 0))  # output 1 is heatmaps
             heatmap = np.transpose(np.squeeze(Mconv7_stage6_L2), (1, 2, 0))  # output 1 is heatmaps
             heatmap = cv2.resize(heatmap, (0, 0), fx=stride, fy=stride, interpolation=cv2.INTER_CUBIC)
-            heatmap = heatmap[:imageToTest_padded.shape[0] - pad[2], :imageToTest_padded.shape[1] - pad[3], :]
-            heatmap = cv2.resize(heatmap, (oriImg.shape[1], oriImg.shape[0]), interpolation=cv2.INTER_CUBIC)
+            heatmap = heatmap[:h, :w, :]
+            heatmap = cv2.resize(heatmap, (oriImg.shape[1], oriImg.shape[0]), dst=heatmap_avg if m == 0 else heatmap_tmp,
+                                 interpolation=cv2.INTER_CUBIC)
 
             # paf = np.transpose(np.squeeze(net.blobs[output_blobs.keys()[0]].data), (1, 2, 0))  # output 0 is PAFs
             paf = np.transpose(np.squeeze(Mconv7_stage6_L1), (1, 2, 0))  # output 0 is PAFs
             paf = cv2.resize(paf, (0, 0), fx=stride, fy=stride, interpolation=cv2.INTER_CUBIC)
-            paf = paf[:imageToTest_padded.shape[0] - pad[2], :imageToTest_padded.shape[1] - pad[3], :]
-            paf = cv2.resize(paf, (oriImg.shape[1], oriImg.shape[0]), interpolation=cv2.INTER_CUBIC)
+            paf = paf[:h, :w, :]
+            paf = cv2.resize(paf, (oriImg.shape[1], oriImg.shape[0]), dst=paf_avg if m == 0 else paf_tmp,
+                             interpolation=cv2.INTER_CUBIC)
+
+            if m > 0:
+                heatmap_avg += heatmap
+                paf_avg += paf
 
-            heatmap_avg += heatmap_avg + heatmap / len(multiplier)
-            paf_avg += + paf / len(multiplier)
+        if len(multiplier) > 1:
+            heatmap_avg *= np.float32(1 / len(multiplier))
+            paf_avg *= np.float32(1 / len(multiplier))
 
         all_peaks = []
         peak_counter = 0
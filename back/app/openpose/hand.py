@@ -0,0 +1,96 @@
+import math
+
+import cv2
+import numpy as np
+import torch
+
+from . import util
+from . import model
+
+# 身体关键点编号（COCO 18 点顺序）
+NOSE, R_SHOULDER, R_WRIST, L_SHOULDER, L_WRIST = 0, 2, 4, 5, 7
+# handDetect 返回的 is_left 对应的手腕编号
+HAND_WRIST = {True: L_WRIST, False: R_WRIST}
+
+
+class Hand(object):
+    """
+    手部关键点检测。只在手腕靠近面部时运行，只处理 util.handDetect 给出的手部方框：
+    各方框缩放到 input_size 的正方形后拼成一个批次，两只手一次前向完成，不对整帧再跑一遍网络。
+    """
+
+    def __init__(self, model_path, input_size=184, gate_ratio=0.8, thre=0.05):
+        self.model = model.handpose_model()
+        if torch.cuda.is_available():
+            self.model = self.model.cuda()
+        model_dict = util.transfer(self.model, torch.load(model_path))
+        self.model.load_state_dict(model_dict)
+        self.model.eval()
+        # 网络步长为 8，输入边长取 8 的倍数，无需填充
+        self.input_size = int(math.ceil(input_size / 8) * 8)
+        self.gate_ratio = gate_ratio
+        self.thre = thre
+
+    def near_face(self, candidate, person):
+        """
+        判断两只手腕是否靠近面部：手腕到鼻子的距离小于 gate_ratio 倍肩宽。
+
+        返回值：
+        字典 {is_left: 布尔值}，与 handDetect 返回的 is_left 对应。鼻子或两肩缺失时均为 False。
+        """
+        index = person.astype(int)
+        res = {True: False, False: False}
+        if index[NOSE] == -1 or index[R_SHOULDER] == -1 or index[L_SHOULDER] == -1:
+            return res
+        nose = candidate[index[NOSE]][:2]
+        shoulder_width = np.hypot(*(candidate[index[R_SHOULDER]][:2] - candidate[index[L_SHOULDER]][:2]))
+        for is_left, wrist in HAND_WRIST.items():
+            if index[wrist] != -1:
+                res[is_left] = np.hypot(*(candidate[index[wrist]][:2] - nose)) < self.gate_ratio * shoulder_width
+        return res
+
+    def detect(self, oriImg, candidate, subset):
+        """
+        对第一个人靠近面部的手检测手部关键点。
+
+        返回值：
+        列表 [(is_left, peaks)]，peaks 为 (21, 3) 的数组，每行为原图坐标 x, y 与置信度；
+        置信度低于阈值的关键点坐标为 NaN。没有手腕靠近面部时返回空列表，不做任何推理。
+        """
+        if len(subset) == 0:
+            return []
+        near = self.near_face(candidate, subset[0])
+        if not any(near.values()):
+            return []
+        rois = [roi for roi in util.handDetect(candidate, subset[:1], oriImg) if near[roi[3]]]
+        if not rois:
+            return []
+
+        size = self.input_size
+        batch = np.empty((len(rois), 3, size, size), dtype=np.float32)
+        for n, (x, y, w, _) in enumerate(rois):
+            crop = cv2.resize(oriImg[y:y + w, x:x + w], (size, size), interpolation=cv2.INTER_LINEAR)
+            batch[n] = np.transpose(crop, (2, 0, 1))
+        batch = batch / 256 - 0.5
+
+        data = torch.from_numpy(batch)
+        if torch.cuda.is_available():
+            data = data.cuda()
+        with torch.no_grad():
+            output = self.model(data).cpu().numpy()
+
+        return [(is_left, self._peaks(output[n], x, y, w)) for n, (x, y, w, is_left) in enumerate(rois)]
+
+    def _peaks(self, heatmaps, x, y, w):
+        # heatmaps 为 (22, size/8, size/8)，最后一个通道为背景；放大到方框大小后取每个关键点的最大值位置
+        heatmap = cv2.resize(np.transpose(heatmaps[:21], (1, 2, 0)), (w, w), interpolation=cv2.INTER_CUBIC)
+        peaks = np.full((21, 3), np.nan)
+        for part in range(21):
+            one_heatmap = cv2.GaussianBlur(heatmap[:, :, part], (0, 0), 3)
+            py, px = util.npmax(one_heatmap)
+            score = one_heatmap[py, px]
+            peaks[part, 2] = score
+            if score > self.thre:
+                peaks[part, 0] = x + px
+                peaks[part, 1] = y + py
+        return peaks
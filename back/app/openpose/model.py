@@ -138,6 +138,10 @@ class bodypose_model(nn.Module):
 
         return out6_1, out6_2
 
+    def stage1_heatmaps(self, x):
+        # 只计算主干网络与第一阶段的关键点热图，用于低成本地判断画面中是否有人
+        return self.model1_2(self.model0(x))
+
 class handpose_model(nn.Module):
     def __init__(self):
         super(handpose_model, self).__init__()
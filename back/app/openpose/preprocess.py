@@ -0,0 +1,95 @@
+"""
+网络输入的预处理：缩放、右下角填充到 stride 的倍数、归一化为 (1, 3, H, W) 的 float32 数组。
+
+InputBuffer 把每一步写入预先分配好的缓冲区，同一尺寸的帧重复使用同一组缓冲区，每帧不再新建数组。
+填充区域归一化后恒为 (padValue / 256 - 0.5)，只在分配时写一次。
+
+测量两种实现每帧的内存分配（在 back 目录下）：
+    python -m app.openpose.preprocess
+"""
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from . import util
+
+
+def preprocess_legacy(oriImg, scale, stride=8, padValue=128):
+    # 原实现：每一步都产生新数组，保留用于对比测量
+    imageToTest = cv2.resize(oriImg, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+    imageToTest_padded, pad = util.padRightDownCorner(imageToTest, stride, padValue)
+    im = np.transpose(np.float32(imageToTest_padded[:, :, :, np.newaxis]), (3, 2, 0, 1)) / 256 - 0.5
+    im = np.ascontiguousarray(im)
+    return im, (imageToTest.shape[0], imageToTest.shape[1])
+
+
+class InputBuffer(object):
+    """
+    可复用的网络输入缓冲区，按缩放后的尺寸缓存。
+
+    调用返回 (data, (h, w))：data 为 (1, 3, H, W) 的 float32 数组，H、W 为 h、w 向上取整到 stride 的倍数。
+    data 在下一次同尺寸调用时会被覆盖，调用方用完之前不要再次调用。
+    """
+
+    def __init__(self, stride=8, padValue=128):
+        self.stride = stride
+        self.padValue = padValue
+        self.buffers = {}
+
+    def _buffers(self, h, w):
+        key = (h, w)
+        if key not in self.buffers:
+            padded_h = -(-h // self.stride) * self.stride
+            padded_w = -(-w // self.stride) * self.stride
+            data = np.full((1, 3, padded_h, padded_w), self.padValue / 256 - 0.5, dtype=np.float32)
+            resized = np.empty((h, w, 3), dtype=np.uint8)
+            self.buffers[key] = (resized, data)
+        return self.buffers[key]
+
+    def __call__(self, oriImg, scale):
+        # 与 cv2.resize(fx=scale, fy=scale) 得到的尺寸一致
+        h = int(round(oriImg.shape[0] * scale))
+        w = int(round(oriImg.shape[1] * scale))
+        resized, data = self._buffers(h, w)
+        # 尺寸与 dst 一致时 cv2 直接写入 dst
+        resized = cv2.resize(oriImg, (0, 0), dst=resized, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+        # HWC 的 uint8 直接写入 CHW 的 float32 区域，再原地减去 0.5
+        region = data[0, :, :h, :w]
+        np.multiply(resized.transpose(2, 0, 1), np.float32(1 / 256), out=region, dtype=np.float32)
+        region -= np.float32(0.5)
+        return data, (h, w)
+
+
+def measure(func, oriImg, scale, frames=50):
+    """
+    测量 func(oriImg, scale) 每帧的开销：返回 (每帧新分配内存的峰值字节数, 每帧耗时毫秒数)。
+    先调用一次预热（InputBuffer 在这一次分配缓冲区），之后逐帧统计；numpy 与 cv2 输出数组的分配都计入 tracemalloc。
+    """
+    func(oriImg, scale)
+    start = time.perf_counter()
+    for _ in range(frames):
+        func(oriImg, scale)
+    elapsed = (time.perf_counter() - start) / frames
+
+    peak = 0
+    tracemalloc.start()
+    try:
+        for _ in range(frames):
+            tracemalloc.reset_peak()
+            current = tracemalloc.get_traced_memory()[0]
+            result = func(oriImg, scale)
+            peak += tracemalloc.get_traced_memory()[1] - current
+            del result
+    finally:
+        tracemalloc.stop()
+    return peak / frames, elapsed * 1000
+
+
+if __name__ == '__main__':
+    for name, func in (('preprocess_legacy', preprocess_legacy), ('InputBuffer', InputBuffer())):
+        for shape in ((96, 128, 3), (480, 640, 3), (720, 1280, 3)):
+            image = np.random.randint(0, 256, shape, dtype=np.uint8)
+            peak, ms = measure(func, image, 0.5 * 368 / shape[0])
+            print(f"{name} {shape[1]}x{shape[0]}: 每帧新分配 {peak / 1024:.1f} KiB，耗时 {ms:.3f} ms")
@@ -1,10 +1,7 @@
+import colorsys
 import math
 import cv2
-import matplotlib
-from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
-from matplotlib.figure import Figure
 import numpy as np
-import matplotlib.pyplot as plt
 
 
 def padRightDownCorner(img, stride, padValue):
@@ -36,31 +33,44 @@ def transfer(model, model_weights):
         transfered_model_weights[weights_name] = model_weights['.'.join(weights_name.split('.')[1:])]
     return transfered_model_weights
 
+# 身体连线与颜色（BGR 顺序与原实现一致）
+BODY_LIMB_SEQ = [[2, 3], [2, 6], [3, 4], [4, 5], [6, 7], [7, 8], [2, 9], [9, 10], \
+                 [10, 11], [2, 12], [12, 13], [13, 14], [2, 1], [1, 15], [15, 17], \
+                 [1, 16], [16, 18], [3, 17], [6, 18]]
+BODY_COLORS = [[255, 0, 0], [255, 85, 0], [255, 170, 0], [255, 255, 0], [170, 255, 0], [85, 255, 0], [0, 255, 0], \
+               [0, 255, 85], [0, 255, 170], [0, 255, 255], [0, 170, 255], [0, 85, 255], [0, 0, 255], [85, 0, 255], \
+               [170, 0, 255], [255, 0, 255], [255, 0, 170], [255, 0, 85]]
+HAND_EDGES = [[0, 1], [1, 2], [2, 3], [3, 4], [0, 5], [5, 6], [6, 7], [7, 8], [0, 9], [9, 10], \
+              [10, 11], [11, 12], [0, 13], [13, 14], [14, 15], [15, 16], [0, 17], [17, 18], [18, 19], [19, 20]]
+# 手部连线按色相均匀取色，预先换算为 0~255
+HAND_EDGE_COLORS = [tuple(int(c * 255) for c in colorsys.hsv_to_rgb(ie / float(len(HAND_EDGES)), 1.0, 1.0))
+                    for ie in range(len(HAND_EDGES))]
+
+
 # draw the body keypoint and lims
 def draw_bodypose(canvas, candidate, subset):
+    """
+    在 canvas 上绘制身体关键点与连线并返回 canvas（原地修改）。
+    所有连线先画到同一个图层上，最后只做一次半透明混合。
+    """
     stickwidth = 4
-    limbSeq = [[2, 3], [2, 6], [3, 4], [4, 5], [6, 7], [7, 8], [2, 9], [9, 10], \
-               [10, 11], [2, 12], [12, 13], [13, 14], [2, 1], [1, 15], [15, 17], \
-               [1, 16], [16, 18], [3, 17], [6, 18]]
-
-    colors = [[255, 0, 0], [255, 85, 0], [255, 170, 0], [255, 255, 0], [170, 255, 0], [85, 255, 0], [0, 255, 0], \
-              [0, 255, 85], [0, 255, 170], [0, 255, 255], [0, 170, 255], [0, 85, 255], [0, 0, 255], [85, 0, 255], \
-              [170, 0, 255], [255, 0, 255], [255, 0, 170], [255, 0, 85]]
     for i in range(18):
         for n in range(len(subset)):
             index = int(subset[n][i])
             if index == -1:
                 continue
             x, y = candidate[index][0:2]
-            cv2.circle(canvas, (int(x), int(y)), 2, colors[i], thickness=-1)
+            cv2.circle(canvas, (int(x), int(y)), 2, BODY_COLORS[i], thickness=-1)
             cv2.putText(canvas, str(int(candidate[index][3])), (int(x), int(y)), cv2.FONT_HERSHEY_PLAIN, 3,
                         (255, 0, 0), 3)
+    overlay = None
     for i in range(17):
         for n in range(len(subset)):
-            index = subset[n][np.array(limbSeq[i]) - 1]
+            index = subset[n][np.array(BODY_LIMB_SEQ[i]) - 1]
             if -1 in index:
                 continue
-            cur_canvas = canvas.copy()
+            if overlay is None:
+                overlay = canvas.copy()
             Y = candidate[index.astype(int), 0]
             X = candidate[index.astype(int), 1]
             mX = np.mean(X)
@@ -68,59 +78,35 @@ def draw_bodypose(canvas, candidate, subset):
             length = ((X[0] - X[1]) ** 2 + (Y[0] - Y[1]) ** 2) ** 0.5
             angle = math.degrees(math.atan2(X[0] - X[1], Y[0] - Y[1]))
             polygon = cv2.ellipse2Poly((int(mY), int(mX)), (int(length / 2), stickwidth), int(angle), 0, 360, 1)
-            cv2.fillConvexPoly(cur_canvas, polygon, colors[i])
-            canvas = cv2.addWeighted(canvas, 0.4, cur_canvas, 0.6, 0)
-    plt.imsave("preview.jpg", canvas[:, :, [2, 1, 0]])
-    plt.imshow(canvas[:, :, [2, 1, 0]])
+            cv2.fillConvexPoly(overlay, polygon, BODY_COLORS[i])
+    if overlay is not None:
+        cv2.addWeighted(canvas, 0.4, overlay, 0.6, 0, dst=canvas)
     return canvas
 
 def draw_handpose(canvas, all_hand_peaks, show_number=False):
-    edges = [[0, 1], [1, 2], [2, 3], [3, 4], [0, 5], [5, 6], [6, 7], [7, 8], [0, 9], [9, 10], \
-             [10, 11], [11, 12], [0, 13], [13, 14], [14, 15], [15, 16], [0, 17], [17, 18], [18, 19], [19, 20]]
-    fig = Figure(figsize=plt.figaspect(canvas))
-
-    fig.subplots_adjust(0, 0, 1, 1)
-    fig.subplots_adjust(bottom=0, top=1, left=0, right=1)
-    bg = FigureCanvas(fig)
-    ax = fig.subplots()
-    ax.axis('off')
-    ax.imshow(canvas)
-
-    width, height = ax.figure.get_size_inches() * ax.figure.get_dpi()
-
+    # 用 OpenCV 直接在 canvas 上绘制所有手部关键点（原地修改），坐标为 (0, 0) 的关键点视为未检测到
     for peaks in all_hand_peaks:
-        for ie, e in enumerate(edges):
-            if np.sum(np.all(peaks[e], axis=1)==0)==0:
-                x1, y1 = peaks[e[0]]
-                x2, y2 = peaks[e[1]]
-                ax.plot([x1, x2], [y1, y2], color=matplotlib.colors.hsv_to_rgb([ie/float(len(edges)), 1.0, 1.0]))
-
-        for i, keyponit in enumerate(peaks):
-            x, y = keyponit
-            ax.plot(x, y, 'r.')
-            if show_number:
-                ax.text(x, y, str(i))
-    bg.draw()
-    canvas = np.fromstring(bg.tostring_rgb(), dtype='uint8').reshape(int(height), int(width), 3)
+        draw_handpose_by_opencv(canvas, peaks, show_number)
     return canvas
 
-# image drawed by opencv is not good.
 def draw_handpose_by_opencv(canvas, peaks, show_number=False):
-    edges = [[0, 1], [1, 2], [2, 3], [3, 4], [0, 5], [5, 6], [6, 7], [7, 8], [0, 9], [9, 10], \
-             [10, 11], [11, 12], [0, 13], [13, 14], [14, 15], [15, 16], [0, 17], [17, 18], [18, 19], [19, 20]]
-    # cv2.rectangle(canvas, (x, y), (x+w, y+w), (0, 255, 0), 2, lineType=cv2.LINE_AA)
-    # cv2.putText(canvas, 'left' if is_left else 'right', (x, y), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-    for ie, e in enumerate(edges):
+    # 未检出的关键点可能为 NaN，转换为整数前按 (0, 0) 处理，与其他未检出的关键点一样不绘制
+    peaks = np.asarray(peaks, dtype=np.float64)
+    peaks = np.where(np.isfinite(peaks).all(axis=1, keepdims=True), peaks, 0).astype(int)
+    for ie, e in enumerate(HAND_EDGES):
         if np.sum(np.all(peaks[e], axis=1)==0)==0:
             x1, y1 = peaks[e[0]]
             x2, y2 = peaks[e[1]]
-            cv2.line(canvas, (x1, y1), (x2, y2), matplotlib.colors.hsv_to_rgb([ie/float(len(edges)), 1.0, 1.0])*255, thickness=2)
+            cv2.line(canvas, (int(x1), int(y1)), (int(x2), int(y2)), HAND_EDGE_COLORS[ie], thickness=2,
+                     lineType=cv2.LINE_AA)
 
     for i, keyponit in enumerate(peaks):
         x, y = keyponit
-        cv2.circle(canvas, (x, y), 4, (0, 0, 255), thickness=-1)
+        if x == 0 and y == 0:
+            continue
+        cv2.circle(canvas, (int(x), int(y)), 4, (0, 0, 255), thickness=-1)
         if show_number:
-            cv2.putText(canvas, str(i), (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.3, (0, 0, 0), lineType=cv2.LINE_AA)
+            cv2.putText(canvas, str(i), (int(x), int(y)), cv2.FONT_HERSHEY_SIMPLEX, 0.3, (0, 0, 0), lineType=cv2.LINE_AA)
     return canvas
 
 # workbench hand according to body pose keypoints
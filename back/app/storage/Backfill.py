@@ -0,0 +1,109 @@
+"""
+回填第4版表结构新增的整数时间戳列，并可把早期的 posture_log 逐次记录合并为坐姿片段、由片段重新生成汇总表。
+
+用法（在 back 目录下）：
+    python -m app.storage.Backfill [--batch 1000] [--episodes] [--rollups]
+
+按主键分批处理，每批一个事务，可以在服务运行时执行；中断后重新运行会从未回填的数据继续。
+--rollups 重建期间趋势与日报读到的汇总不完整，重建完成后恢复。
+"""
+import argparse
+from datetime import datetime
+
+from config import config
+from . import get_storage
+from .Base import LEGACY_TIMESTAMP_FORMAT, day_start, parse_day
+from ..workbench.PostureEpisodes import EpisodeTracker
+
+
+def _parse_log_timestamp(text):
+    return int(datetime.strptime(text, LEGACY_TIMESTAMP_FORMAT).timestamp())
+
+
+def _parse_suggestion_date(text):
+    # 早期的提醒只记录了日期，回填为当天零点
+    return day_start(parse_day(text))
+
+
+def backfill_column(storage, table, source, parse, batch):
+    """
+    把 table 中 ts 为空的行按 source 列的旧格式换算后写入 ts，返回回填的行数。
+    """
+    total = 0
+    last_id = 0
+    while True:
+        rows = storage.query(f"SELECT id, {source} FROM {table} WHERE ts IS NULL AND id > %s ORDER BY id LIMIT %s",
+                             (last_id, batch))
+        if not rows:
+            return total
+        updates = []
+        for row_id, value in rows:
+            try:
+                updates.append((parse(value), row_id))
+            except ValueError:
+                print(f"{table} 第 {row_id} 行的时间无法解析，跳过: {value}")
+        if updates:
+            storage.executemany(f"UPDATE {table} SET ts = %s WHERE id = %s", updates)
+        total += len(updates)
+        last_id = rows[-1][0]
+        print(f"{table}: 已回填 {total} 行")
+
+
+def fold_posture_log(storage, batch):
+    """
+    把 posture_log 中早于片段表启用时最早片段的逐次记录合并为坐姿片段写入 posture_episode，返回片段数。
+
+    合并范围的上界在第一次执行时确定，每批片段与已合并到的位置 (ts, id) 记录在 backfill_state 中、
+    在同一个事务中提交；中断后重新运行从该位置继续，重复执行时不会重复合并。
+    每批结束时结束当前片段，批次边界处的同一坐姿会分成两个相邻片段，不影响统计。
+    """
+    state = storage.get_backfill_state()
+    before = state.get('fold_before')
+    if before is None:
+        res = storage.query("SELECT MIN(start_ts) FROM posture_episode")
+        before = res[0][0] if res[0][0] is not None else 2 ** 62
+        storage.set_backfill_state({'fold_before': before})
+    episodes = []
+    tracker = EpisodeTracker(episodes.append, config.EPISODE_MAX_GAP, config.EPISODE_MAX_SECONDS)
+    total = 0
+    last = (state.get('fold_ts', -1), state.get('fold_id', 0))
+    while True:
+        # 按 (ts, id) 分页，由 posture_log(ts) 索引支持
+        rows = storage.query("""
+            SELECT ts, id, posture_mask FROM posture_log
+            WHERE ts < %s AND (ts > %s OR (ts = %s AND id > %s))
+            ORDER BY ts, id LIMIT %s
+        """, (before, last[0], last[0], last[1], batch))
+        if not rows:
+            break
+        for ts, _, mask in rows:
+            tracker.add(ts, mask)
+        tracker.flush()
+        last = rows[-1][:2]
+        storage.insert_posture_episodes(episodes, {'fold_ts': last[0], 'fold_id': last[1]})
+        total += len(episodes)
+        episodes.clear()
+    print(f"posture_log: 已合并为 {total} 个坐姿片段")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='回填整数时间戳列')
+    parser.add_argument('--batch', type=int, default=1000, help='每个事务处理的行数')
+    parser.add_argument('--episodes', action='store_true', help='同时把 posture_log 合并为坐姿片段')
+    parser.add_argument('--rollups', action='store_true', help='由坐姿片段重新生成分钟/小时/天汇总')
+    args = parser.parse_args()
+
+    storage = get_storage()
+    backfill_column(storage, 'posture_log', 'timestamp', _parse_log_timestamp, args.batch)
+    backfill_column(storage, 'suggestions', 'date', _parse_suggestion_date, args.batch)
+    if args.episodes:
+        fold_posture_log(storage, args.batch)
+    if args.rollups:
+        storage.rebuild_rollups(args.batch)
+        print("已重新生成坐姿汇总")
+    storage.maintain_partitions()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,350 @@
+import re
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from config import config
+from ..analyse.PoseMask import BAD_POSES_LIST, MASK_BITS, mask_counts
+from .Rollup import ROLLUP_PERIODS, episode_end, rollup_increments
+
+# 早期 posture_log 中每种不良坐姿各占一列，升级到第2版结构时合并为 posture_mask
+POSTURE_COLUMNS = BAD_POSES_LIST
+
+# 早期 posture_log.timestamp 的字符串格式
+LEGACY_TIMESTAMP_FORMAT = "%Y%m%d%H%M%S"
+
+
+def day_start(day):
+    # 本地时间 day 零点的秒级时间戳
+    return int(datetime(day.year, day.month, day.day).timestamp())
+
+
+def day_bounds(day):
+    # day 当天的时间范围 [start_ts, end_ts)
+    return day_start(day), day_start(day + timedelta(days=1))
+
+
+def parse_day(text):
+    # 解析日期参数，支持早期 suggestions.date 的“2025年3月3日”格式和“2025-03-03”格式
+    match = re.fullmatch(r'\s*(\d{4})\s*[年-]\s*(\d{1,2})\s*[月-]\s*(\d{1,2})\s*日?\s*', text or '')
+    if not match:
+        raise ValueError(f"无法解析日期: {text}")
+    return date(*map(int, match.groups()))
+
+
+def legacy_day_text(day):
+    # 早期 suggestions.date 列中的日期写法
+    return f"{day.year}年{day.month}月{day.day}日"
+
+
+def episodes_between_sql(named=False):
+    """
+    查询与 [start_ts, end_ts] 有重叠的坐姿片段的 SQL，参数依次为 lower、end_ts、start_ts（见 episodes_between_params）。
+    片段长度不超过 EPISODE_MAX_SECONDS，因此开始时间也有下界 lower，可以只扫描 posture_episode(start_ts) 索引上的一小段。
+    named 为 True 时使用 :lower 形式的命名参数（SQLAlchemy 流式查询），否则为 %s。
+    """
+    lower, end, start = (':lower', ':end_ts', ':start_ts') if named else ('%s', '%s', '%s')
+    return f"""
+        SELECT start_ts, end_ts, posture_mask, samples
+        FROM posture_episode
+        WHERE start_ts BETWEEN {lower} AND {end} AND end_ts >= {start}
+        ORDER BY start_ts
+    """
+
+
+def episodes_between_params(start_ts, end_ts):
+    return {'lower': start_ts - config.EPISODE_MAX_SECONDS, 'start_ts': start_ts, 'end_ts': end_ts}
+
+
+def expand_episodes(rows, start_ts, end_ts):
+    """
+    把坐姿片段还原为逐次检测的样本，片段内的样本按等间隔分布，只保留 [start_ts, end_ts] 内的样本。
+
+    参数：
+    rows：列表
+        每行为 (start_ts, end_ts, posture_mask, samples)。
+
+    返回值：
+    元组 (timestamps, masks)，分别为 float64 时间戳数组和 uint16 掩码数组，顺序与 rows 一致。
+    """
+    if not rows:
+        return np.zeros(0), np.zeros(0, dtype=np.uint16)
+    timestamps = np.concatenate([np.linspace(s, e, n) for s, e, _, n in rows])
+    masks = np.repeat(np.array([row[2] for row in rows], dtype=np.uint16), [row[3] for row in rows])
+    keep = (timestamps >= start_ts) & (timestamps <= end_ts)
+    return timestamps[keep], masks[keep]
+
+
+class BaseStorage:
+    """
+    坐姿数据存储的公共实现。各后端只需提供 _connection（借出连接）、_create_tables（建初始表）、
+    migrations（表结构升级步骤）、SQL 参数占位符 placeholder 以及汇总表的累加语句 rollup_upsert，
+    所有业务读写都通过这里的方法完成。
+    """
+
+    # SQL 参数占位符，MySQL 为 %s，SQLite 为 ?
+    placeholder = '%s'
+    # 汇总表的累加写入语句，各后端的 upsert 语法不同
+    rollup_upsert = None
+    # 累计的数据库往返次数，用于统计每个检查周期访问数据库的次数
+    round_trips = 0
+
+    @contextmanager
+    def _connection(self):
+        raise NotImplementedError
+
+    def _create_tables(self):
+        # 按第1版结构建表（表已存在时不变）
+        raise NotImplementedError
+
+    def migrations(self):
+        # 返回 [(版本号, [步骤, ...]), ...]，按版本号升序；步骤为 SQL 或无参数的函数
+        raise NotImplementedError
+
+    def _migrate(self, target, steps):
+        # 依次执行一个版本的升级步骤并记录版本号。中途失败时版本号不会记录，下次启动重新执行该版本，
+        # 因此不能在事务中执行的步骤须能重复执行
+        for step in steps:
+            if callable(step):
+                step()
+            else:
+                self.execute(step)
+        self.execute("insert into schema_version(version) values(%s)", (target,))
+
+    def ensure_schema(self):
+        """
+        建表并把表结构升级到最新版本。已执行过的升级记录在 schema_version 表中，不会重复执行。
+        """
+        self._create_tables()
+        self.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+        res = self.query("SELECT MAX(version) FROM schema_version")
+        version = res[0][0] or 1
+        for target, steps in self.migrations():
+            if target <= version:
+                continue
+            print(f"升级数据库表结构到第 {target} 版")
+            self._migrate(target, steps)
+            version = target
+
+    def _sql(self, sql):
+        # 业务 SQL 统一用 %s 书写，按后端替换占位符
+        return sql.replace('%s', self.placeholder)
+
+    def execute(self, sql, params=()):
+        self.round_trips += 1
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self._sql(sql), params)
+            conn.commit()
+            cursor.close()
+
+    def executemany(self, sql, rows):
+        # 所有行在同一个事务中写入并提交一次
+        self.round_trips += 1
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(self._sql(sql), rows)
+            conn.commit()
+            cursor.close()
+
+    def query(self, sql, params=()):
+        self.round_trips += 1
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self._sql(sql), params)
+            res = cursor.fetchall()
+            cursor.close()
+        return res
+
+    # 批量写入坐姿片段，每行为 (start_ts, end_ts, posture_mask, samples)，时间为整数秒级时间戳；
+    # 同时把片段累加到分钟/小时/天汇总表，二者在同一个事务中提交，汇总不会重复计入或遗漏。
+    # backfill_state 为 {名称: 整数} 时一并更新回填进度，中断后不会重复合并或遗漏
+    def insert_posture_episodes(self, rows, backfill_state=None):
+        increments = rollup_increments(rows)
+        self.round_trips += 1
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            if rows:
+                cursor.executemany(self._sql("insert into posture_episode(start_ts,end_ts,posture_mask,samples) "
+                                             "values(%s,%s,%s,%s);"), rows)
+                cursor.executemany(self._sql(self.rollup_upsert), increments)
+            if backfill_state:
+                cursor.executemany(self._sql("REPLACE INTO backfill_state(name,value) values(%s,%s)"),
+                                   list(backfill_state.items()))
+            conn.commit()
+            cursor.close()
+
+    def get_backfill_state(self):
+        return {name: int(value) for name, value in self.query("SELECT name, value FROM backfill_state")}
+
+    def set_backfill_state(self, state):
+        self.executemany("REPLACE INTO backfill_state(name,value) values(%s,%s)", list(state.items()))
+
+    def episodes_between(self, start_ts, end_ts):
+        # 与 [start_ts, end_ts] 有重叠的片段 (start_ts, end_ts, posture_mask, samples)，按开始时间升序
+        params = episodes_between_params(start_ts, end_ts)
+        return self.query(episodes_between_sql(), (params['lower'], params['end_ts'], params['start_ts']))
+
+    def episodes_after(self, episode_id, limit):
+        # id 大于 episode_id 的 limit 个片段 (id, start_ts, end_ts, posture_mask, samples)，按 id 升序，用于增量导出。
+        # id 按写入顺序递增，晚写入但开始时间更早的片段（如 Backfill 合并的历史记录）也不会遗漏
+        return self.query("""
+            SELECT id, start_ts, end_ts, posture_mask, samples
+            FROM posture_episode
+            WHERE id > %s
+            ORDER BY id LIMIT %s
+        """, (episode_id, limit))
+
+    def posture_summary(self, start_ts, end_ts):
+        """
+        统计 [start_ts, end_ts] 内的检测次数、各不良坐姿出现的次数与持续秒数。每次检测计一个采样间隔，
+        片段覆盖的时间（见 episode_end）按区间截断，与汇总表的 seconds 算法一致。
+        """
+        # 结束于 start_ts 之前的片段，其最后一个采样间隔（不超过 EPISODE_MAX_GAP）仍可能落在区间内
+        rows = self.episodes_between(start_ts - max(config.EPISODE_MAX_GAP, config.DETECT_INTERVAL), end_ts)
+        _, masks = expand_episodes(rows, start_ts, end_ts)
+        durations = np.zeros(len(BAD_POSES_LIST))
+        for s, e, mask, n in rows:
+            span = max(0, min(episode_end(s, e, n), end_ts) - max(s, start_ts))
+            for i in MASK_BITS[mask]:
+                durations[i] += span
+        counts = mask_counts(masks)
+        return {
+            'samples': len(masks),
+            'counts': {name: int(count) for name, count in zip(BAD_POSES_LIST, counts)},
+            'durations': {name: int(round(duration)) for name, duration in zip(BAD_POSES_LIST, durations)},
+        }
+
+    # 截至 until_ts 的最近 limit 次检测中，各不良坐姿出现的次数。每个片段至少包含一次检测，
+    # 最多只需按开始时间倒序取 limit 个片段，由 posture_episode(start_ts) 上的索引支持
+    def posture_window_sums(self, until_ts, limit):
+        rows = self.query(f"""
+            SELECT posture_mask, samples
+            FROM posture_episode
+            WHERE start_ts <= %s
+            ORDER BY start_ts DESC
+            LIMIT {int(limit)}
+        """, (until_ts,))
+        sums = [0] * len(BAD_POSES_LIST)
+        remaining = limit
+        for mask, samples in rows:
+            taken = min(samples, remaining)
+            for i in MASK_BITS[mask]:
+                sums[i] += taken
+            remaining -= taken
+            if remaining <= 0:
+                break
+        return dict(zip(BAD_POSES_LIST, sums))
+
+    def rollups_between(self, period, start_ts, end_ts):
+        # [start_ts, end_ts) 内某一粒度的汇总行 (bucket_ts, posture_mask, samples, seconds)，按桶升序
+        return self.query("""
+            SELECT bucket_ts, posture_mask, samples, seconds
+            FROM posture_rollup
+            WHERE period = %s AND bucket_ts >= %s AND bucket_ts < %s
+            ORDER BY bucket_ts
+        """, (ROLLUP_PERIODS[period], start_ts, end_ts))
+
+    def posture_trend(self, period, start_ts, end_ts):
+        """
+        按汇总桶统计 [start_ts, end_ts) 内的坐姿，只读取汇总表，行数与桶数成正比。
+
+        参数：
+        period：字符串
+            'minute'、'hour' 或 'day'。
+
+        返回值：
+        列表，每个有数据的桶一项：{'bucket_ts', 'samples', 'bad_samples', 'counts': {坐姿: 次数},
+        'durations': {坐姿: 秒数}}，按时间升序。
+        """
+        buckets = {}
+        for bucket_ts, mask, samples, seconds in self.rollups_between(period, start_ts, end_ts):
+            bucket = buckets.get(bucket_ts)
+            if bucket is None:
+                bucket = buckets[bucket_ts] = {'bucket_ts': int(bucket_ts), 'samples': 0, 'bad_samples': 0,
+                                               'counts': [0] * len(BAD_POSES_LIST),
+                                               'durations': [0] * len(BAD_POSES_LIST)}
+            bucket['samples'] += int(samples)
+            if mask:
+                bucket['bad_samples'] += int(samples)
+            for i in MASK_BITS[mask]:
+                bucket['counts'][i] += int(samples)
+                bucket['durations'][i] += int(seconds)
+        for bucket in buckets.values():
+            bucket['counts'] = dict(zip(BAD_POSES_LIST, bucket['counts']))
+            bucket['durations'] = dict(zip(BAD_POSES_LIST, bucket['durations']))
+        return list(buckets.values())
+
+    def rebuild_rollups(self, batch=1000):
+        """
+        由 posture_episode 重新计算全部汇总，用于升级后首次生成或修复汇总表，可在服务运行时执行。
+
+        清空汇总表与读取当时的最大片段 id 在同一个事务中完成：id 不超过它的片段由这里重新累加，
+        之后写入的片段已由写入线程在插入时累加，不会重复计入。重建完成前趋势与日报中的汇总不完整。
+        """
+        self.round_trips += 1
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            # 先删除再读取：删除会等待正在累加汇总的写入事务提交，随后读到的最大 id 包含这些片段
+            cursor.execute("DELETE FROM posture_rollup")
+            cursor.execute("SELECT MAX(id) FROM posture_episode")
+            max_id = cursor.fetchall()[0][0]
+            conn.commit()
+            cursor.close()
+        if max_id is None:
+            return
+        last_id = 0
+        while True:
+            rows = self.query("""
+                SELECT id, start_ts, end_ts, posture_mask, samples
+                FROM posture_episode
+                WHERE id > %s AND id <= %s
+                ORDER BY id LIMIT %s
+            """, (last_id, max_id, batch))
+            if not rows:
+                return
+            self.executemany(self.rollup_upsert, rollup_increments([row[1:] for row in rows]))
+            last_id = rows[-1][0]
+
+    def _prune_rollups(self, today):
+        # 细粒度汇总只保留较短时间，按 ROLLUP_RETENTION_DAYS 删除
+        for period, days in config.ROLLUP_RETENTION_DAYS.items():
+            if days:
+                self.execute("DELETE FROM posture_rollup WHERE period = %s AND bucket_ts < %s",
+                             (ROLLUP_PERIODS[period], day_start(today - timedelta(days=days))))
+
+    @staticmethod
+    def _mask_expr():
+        # 由早期的十个坐姿列计算 posture_mask 的 SQL 表达式
+        return ' | '.join(f"({column} << {i})" for i, column in enumerate(POSTURE_COLUMNS))
+
+    def maintain_partitions(self, now_ts=None):
+        # 按 DATA_RETENTION_DAYS 清理过期数据；MySQL 后端改为维护按天的分区
+        today = datetime.fromtimestamp(now_ts or time.time()).date()
+        self._prune_rollups(today)
+        if not config.DATA_RETENTION_DAYS:
+            return
+        cutoff = day_start(today - timedelta(days=config.DATA_RETENTION_DAYS))
+        # 均为索引上的范围删除
+        self.execute("DELETE FROM posture_episode WHERE start_ts < %s", (cutoff,))
+        self.execute("DELETE FROM posture_log WHERE ts < %s", (cutoff,))
+
+    def insert_suggestion(self, ts, warning_content):
+        # date 列保留早期的日期写法，查询只使用 ts 列
+        day = datetime.fromtimestamp(ts).date()
+        self.execute("insert into suggestions(ts,date,warning_content) values(%s,%s,%s);",
+                     (ts, legacy_day_text(day), warning_content))
+
+    def list_suggestions(self):
+        return self.query("SELECT * FROM suggestions;")
+
+    def suggestions_on(self, day):
+        # day 当天的提醒，由 suggestions(ts) 上的索引支持；尚未回填 ts 的早期数据按日期字符串匹配
+        start_ts, end_ts = day_bounds(day)
+        return self.query("""
+            SELECT warning_content, advice_content FROM suggestions WHERE ts >= %s AND ts < %s
+            UNION ALL
+            SELECT warning_content, advice_content FROM suggestions WHERE ts IS NULL AND date = %s
+        """, (start_ts, end_ts, legacy_day_text(day)))
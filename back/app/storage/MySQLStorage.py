@@ -0,0 +1,167 @@
+import time
+from datetime import datetime, timedelta
+
+from config import config
+from ..analyse.DBPool import get_connection
+from .Base import BaseStorage, POSTURE_COLUMNS, day_start
+
+
+class MySQLStorage(BaseStorage):
+    placeholder = '%s'
+    rollup_upsert = ("insert into posture_rollup(period,bucket_ts,posture_mask,samples,seconds) "
+                     "values(%s,%s,%s,%s,%s) "
+                     "ON DUPLICATE KEY UPDATE samples = samples + VALUES(samples), seconds = seconds + VALUES(seconds)")
+
+    def _connection(self):
+        # 连接从共享连接池借出
+        return get_connection()
+
+    def _create_tables(self):
+        # 表不存在时按第1版结构创建；已有的表保持不变，由 migrations 升级
+        posture_columns = ',\n'.join(f"{column} TINYINT NOT NULL DEFAULT 0" for column in POSTURE_COLUMNS)
+        self.execute(f"""
+            CREATE TABLE IF NOT EXISTS posture_log (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                timestamp VARCHAR(14) NOT NULL,
+                {posture_columns}
+            ) ENGINE=InnoDB
+        """)
+        self.execute("""
+            CREATE TABLE IF NOT EXISTS suggestions (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                date VARCHAR(32) NOT NULL,
+                warning_content TEXT,
+                advice_content TEXT
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """)
+        self._ensure_index('posture_log', 'idx_posture_log_timestamp', 'timestamp')
+        self._ensure_index('suggestions', 'idx_suggestions_date', 'date')
+
+    def _ensure_index(self, table, name, columns):
+        # MySQL 不支持 CREATE INDEX IF NOT EXISTS，先查询索引是否已存在
+        res = self.query("""
+            SELECT COUNT(*) FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        """, (table, name))
+        if not res[0][0]:
+            self.execute(f"CREATE INDEX {name} ON {table}({columns})")
+
+    def _columns(self, table):
+        res = self.query("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = %s
+        """, (table,))
+        return {name for (name,) in res}
+
+    def _ensure_column(self, table, column, definition):
+        # MySQL 的 ALTER TABLE 会隐式提交，不能与版本号放在同一个事务中；列已存在时跳过，升级中断后可以重新执行
+        if column not in self._columns(table):
+            self.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def _merge_posture_columns(self):
+        # 旧的坐姿列还在时才换算掩码并删除旧列；删除是一条语句，中断后重新执行只会重复一次换算
+        legacy = [column for column in POSTURE_COLUMNS if column in self._columns('posture_log')]
+        if not legacy:
+            return
+        self._ensure_column('posture_log', 'posture_mask', 'SMALLINT UNSIGNED NOT NULL DEFAULT 0')
+        self.execute(f"UPDATE posture_log SET posture_mask = {self._mask_expr()}")
+        self.execute("ALTER TABLE posture_log " + ', '.join(f"DROP COLUMN {column}" for column in legacy))
+
+    def _partition_episodes(self):
+        # posture_episode 按 start_ts 分区（分区键须包含在主键中），已完成的步骤跳过
+        res = self.query("""
+            SELECT COUNT(*) FROM information_schema.key_column_usage
+            WHERE table_schema = DATABASE() AND table_name = 'posture_episode'
+              AND constraint_name = 'PRIMARY' AND column_name = 'start_ts'
+        """)
+        if not res[0][0]:
+            self.execute("ALTER TABLE posture_episode DROP PRIMARY KEY, ADD PRIMARY KEY (id, start_ts)")
+        res = self.query("""
+            SELECT COUNT(*) FROM information_schema.partitions
+            WHERE table_schema = DATABASE() AND table_name = 'posture_episode' AND partition_name IS NOT NULL
+        """)
+        if not res[0][0]:
+            self.execute("ALTER TABLE posture_episode PARTITION BY RANGE (start_ts) "
+                         "(PARTITION pmax VALUES LESS THAN MAXVALUE)")
+
+    def migrations(self):
+        # 各步骤都能重复执行：升级中途失败时版本号没有记录，下次启动从该版本的第一步重新执行
+        return [
+            # 第2版：十个坐姿列合并为一个10位掩码列
+            (2, [self._merge_posture_columns]),
+            # 第3版：按坐姿片段记录，坐姿不变时不再逐次写入
+            (3, ["""
+                CREATE TABLE IF NOT EXISTS posture_episode (
+                    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                    start_ts BIGINT NOT NULL,
+                    end_ts BIGINT NOT NULL,
+                    posture_mask SMALLINT UNSIGNED NOT NULL,
+                    samples INT UNSIGNED NOT NULL,
+                    INDEX idx_posture_episode_start (start_ts)
+                ) ENGINE=InnoDB
+            """]),
+            # 第4版：时间改为整数秒级时间戳列 ts，早期数据由 Backfill 回填；
+            # posture_episode 按 start_ts 分区（分区键须包含在主键中），每天的分区由 maintain_partitions 创建
+            (4, [
+                lambda: self._ensure_column('posture_log', 'ts', 'BIGINT NULL'),
+                lambda: self._ensure_index('posture_log', 'idx_posture_log_ts', 'ts'),
+                lambda: self._ensure_column('suggestions', 'ts', 'BIGINT NULL'),
+                lambda: self._ensure_index('suggestions', 'idx_suggestions_ts', 'ts'),
+                self._partition_episodes,
+            ]),
+            # 第5版：按分钟/小时/天的坐姿汇总，period 为桶长度（秒），已有片段由 Backfill --rollups 汇总
+            (5, ["""
+                CREATE TABLE IF NOT EXISTS posture_rollup (
+                    period INT UNSIGNED NOT NULL,
+                    bucket_ts BIGINT NOT NULL,
+                    posture_mask SMALLINT UNSIGNED NOT NULL,
+                    samples INT UNSIGNED NOT NULL,
+                    seconds INT UNSIGNED NOT NULL,
+                    PRIMARY KEY (period, bucket_ts, posture_mask)
+                ) ENGINE=InnoDB
+            """]),
+            # 第6版：回填工具的进度，与回填写入的数据在同一个事务中更新
+            (6, ["""
+                CREATE TABLE IF NOT EXISTS backfill_state (
+                    name VARCHAR(64) NOT NULL PRIMARY KEY,
+                    value BIGINT NOT NULL
+                ) ENGINE=InnoDB
+            """]),
+        ]
+
+    def maintain_partitions(self, now_ts=None):
+        """
+        为 posture_episode 预先创建今天及之后 PARTITION_DAYS_AHEAD 天的按天分区（从 pmax 中拆出），
+        并直接删除早于 DATA_RETENTION_DAYS 天的分区，清理过期数据无需逐行 DELETE。
+        """
+        today = datetime.fromtimestamp(now_ts or time.time()).date()
+        self._prune_rollups(today)
+        res = self.query("""
+            SELECT partition_name FROM information_schema.partitions
+            WHERE table_schema = DATABASE() AND table_name = 'posture_episode' AND partition_name IS NOT NULL
+        """)
+        if not res:
+            # 表还未分区
+            return
+        days = sorted(datetime.strptime(name[1:], "%Y%m%d").date() for (name,) in res if name != 'pmax')
+
+        # 新分区只能接在已有分区之后
+        first = max(today, days[-1] + timedelta(days=1)) if days else today
+        last = today + timedelta(days=config.PARTITION_DAYS_AHEAD)
+        new = []
+        day = first
+        while day <= last:
+            new.append(f"PARTITION p{day:%Y%m%d} VALUES LESS THAN ({day_start(day + timedelta(days=1))})")
+            day += timedelta(days=1)
+        if new:
+            self.execute("ALTER TABLE posture_episode REORGANIZE PARTITION pmax INTO "
+                         f"({', '.join(new)}, PARTITION pmax VALUES LESS THAN MAXVALUE)")
+            print(f"已创建 {len(new)} 个坐姿片段分区")
+
+        if config.DATA_RETENTION_DAYS:
+            cutoff = today - timedelta(days=config.DATA_RETENTION_DAYS)
+            expired = [f"p{day:%Y%m%d}" for day in days if day < cutoff]
+            if expired:
+                self.execute(f"ALTER TABLE posture_episode DROP PARTITION {', '.join(expired)}")
+                print(f"已删除过期分区: {expired}")
+            self.execute("DELETE FROM posture_log WHERE ts < %s", (day_start(cutoff),))
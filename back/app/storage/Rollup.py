@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from config import config
+
+# 汇总粒度名称 → 桶长度（秒），posture_rollup.period 列保存桶长度
+ROLLUP_PERIODS = {'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def bucket_bounds(period, ts):
+    """
+    返回 ts 所在汇总桶的范围 [start, end)。小时与天按本地时间对齐，跨夏令时的一天可能不是 86400 秒。
+    """
+    if period == ROLLUP_PERIODS['day']:
+        start = datetime.fromtimestamp(ts).replace(hour=0, minute=0, second=0, microsecond=0)
+        return int(start.timestamp()), int((start + timedelta(days=1)).timestamp())
+    if period == ROLLUP_PERIODS['hour']:
+        start = int(datetime.fromtimestamp(ts).replace(minute=0, second=0, microsecond=0).timestamp())
+        return start, start + 3600
+    start = int(ts) // period * period
+    return start, start + period
+
+
+def episode_end(start_ts, end_ts, samples, interval=None):
+    """
+    片段覆盖时间的终点。每次检测代表到下一次检测之前的一个采样间隔，片段覆盖 [start_ts, end_ts + 间隔)，
+    时长为 samples 个间隔；间隔取片段内的平均间隔，只有一个样本时为 interval（默认 DETECT_INTERVAL）。
+    """
+    if samples > 1:
+        return end_ts + (end_ts - start_ts) / (samples - 1)
+    return end_ts + (config.DETECT_INTERVAL if interval is None else interval)
+
+
+def rollup_increments(rows):
+    """
+    把一批坐姿片段换算为各粒度汇总桶的增量。
+
+    参数：
+    rows：列表
+        每行为 (start_ts, end_ts, posture_mask, samples)，片段内的样本按等间隔分布（与 storage.Base.expand_episodes 一致）。
+
+    返回值：
+    列表，每行为 (period, bucket_ts, posture_mask, samples, seconds)，seconds 为片段覆盖时间（见 episode_end）落在桶内的时长。
+    """
+    increments = {}
+    for s, e, mask, n in rows:
+        sample_ts = np.linspace(s, e, n)
+        cover_end = episode_end(s, e, n)
+        for period in ROLLUP_PERIODS.values():
+            start, end = bucket_bounds(period, s)
+            while start < cover_end:
+                samples = int(np.count_nonzero((sample_ts >= start) & (sample_ts < end)))
+                seconds = min(cover_end, end) - max(s, start)
+                acc = increments.setdefault((period, start, mask), [0, 0.0])
+                acc[0] += samples
+                acc[1] += seconds
+                start, end = bucket_bounds(period, end)
+    return [(period, bucket_ts, mask, samples, int(round(seconds)))
+            for (period, bucket_ts, mask), (samples, seconds) in increments.items()]
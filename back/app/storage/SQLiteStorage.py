@@ -0,0 +1,128 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from .Base import BaseStorage, POSTURE_COLUMNS
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    单机使用的嵌入式 SQLite 存储，无需单独部署数据库服务。
+    使用 WAL 日志模式，写入不阻塞读取；每个线程持有自己的连接。
+    """
+
+    placeholder = '?'
+    rollup_upsert = ("insert into posture_rollup(period,bucket_ts,posture_mask,samples,seconds) "
+                     "values(%s,%s,%s,%s,%s) "
+                     "ON CONFLICT(period, bucket_ts, posture_mask) "
+                     "DO UPDATE SET samples = samples + excluded.samples, seconds = seconds + excluded.seconds")
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL 模式下 NORMAL 只在检查点时同步磁盘，掉电最多丢失最近的事务，不会损坏数据库
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = self._connect()
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _create_tables(self):
+        posture_columns = ',\n'.join(f"{column} INTEGER NOT NULL DEFAULT 0" for column in POSTURE_COLUMNS)
+        with self._connection() as conn:
+            conn.executescript(f"""
+                CREATE TABLE IF NOT EXISTS posture_log (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT NOT NULL,
+                    {posture_columns}
+                );
+                CREATE INDEX IF NOT EXISTS idx_posture_log_timestamp ON posture_log(timestamp);
+                CREATE TABLE IF NOT EXISTS suggestions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    date TEXT NOT NULL,
+                    warning_content TEXT,
+                    advice_content TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_suggestions_date ON suggestions(date);
+            """)
+
+    def _migrate(self, target, steps):
+        # SQLite 的表结构修改可以在事务中执行：一个版本的全部步骤与版本号在同一个事务中提交，中途失败时整体回滚
+        self.round_trips += 1
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN")
+            for sql in steps:
+                cursor.execute(sql)
+            cursor.execute(self._sql("insert into schema_version(version) values(%s)"), (target,))
+            conn.commit()
+            cursor.close()
+
+    def migrations(self):
+        # DROP COLUMN 需要 SQLite 3.35 及以上；更早的版本保留旧的坐姿列，它们有默认值，不影响写入
+        drop_columns = sqlite3.sqlite_version_info >= (3, 35, 0)
+        return [
+            # 第2版：十个坐姿列合并为一个10位掩码列
+            (2, [
+                "ALTER TABLE posture_log ADD COLUMN posture_mask INTEGER NOT NULL DEFAULT 0",
+                f"UPDATE posture_log SET posture_mask = {self._mask_expr()}",
+            ] + [f"ALTER TABLE posture_log DROP COLUMN {column}" for column in POSTURE_COLUMNS if drop_columns]),
+            # 第3版：按坐姿片段记录，坐姿不变时不再逐次写入
+            (3, [
+                """
+                CREATE TABLE IF NOT EXISTS posture_episode (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    start_ts INTEGER NOT NULL,
+                    end_ts INTEGER NOT NULL,
+                    posture_mask INTEGER NOT NULL,
+                    samples INTEGER NOT NULL
+                )
+                """,
+                "CREATE INDEX IF NOT EXISTS idx_posture_episode_start ON posture_episode(start_ts)",
+            ]),
+            # 第4版：时间改为整数秒级时间戳列 ts，早期数据由 Backfill 回填
+            (4, [
+                "ALTER TABLE posture_log ADD COLUMN ts INTEGER",
+                "CREATE INDEX IF NOT EXISTS idx_posture_log_ts ON posture_log(ts)",
+                "ALTER TABLE suggestions ADD COLUMN ts INTEGER",
+                "CREATE INDEX IF NOT EXISTS idx_suggestions_ts ON suggestions(ts)",
+            ]),
+            # 第5版：按分钟/小时/天的坐姿汇总，period 为桶长度（秒），已有片段由 Backfill --rollups 汇总
+            (5, [
+                """
+                CREATE TABLE IF NOT EXISTS posture_rollup (
+                    period INTEGER NOT NULL,
+                    bucket_ts INTEGER NOT NULL,
+                    posture_mask INTEGER NOT NULL,
+                    samples INTEGER NOT NULL,
+                    seconds INTEGER NOT NULL,
+                    PRIMARY KEY (period, bucket_ts, posture_mask)
+                )
+                """,
+            ]),
+            # 第6版：回填工具的进度，与回填写入的数据在同一个事务中更新
+            (6, [
+                """
+                CREATE TABLE IF NOT EXISTS backfill_state (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )
+                """,
+            ]),
+        ]
@@ -0,0 +1,29 @@
+import threading
+
+from config import config
+
+# 全局存储实例，按 config.STORAGE_BACKEND 选择后端
+_storage = None
+_lock = threading.Lock()
+
+
+def get_storage():
+    """
+    返回全局共享的存储实例，首次调用时创建并建表。
+
+    STORAGE_BACKEND 为 'mysql' 时使用 MySQL 连接池，为 'sqlite' 时使用本地 SQLite 数据库文件 SQLITE_PATH。
+    """
+    global _storage
+    with _lock:
+        if _storage is None:
+            if config.STORAGE_BACKEND == 'sqlite':
+                from .SQLiteStorage import SQLiteStorage
+                storage = SQLiteStorage(config.SQLITE_PATH)
+            elif config.STORAGE_BACKEND == 'mysql':
+                from .MySQLStorage import MySQLStorage
+                storage = MySQLStorage()
+            else:
+                raise ValueError(f"未知的存储后端: {config.STORAGE_BACKEND}")
+            storage.ensure_schema()
+            _storage = storage
+        return _storage
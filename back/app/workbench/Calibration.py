@@ -0,0 +1,74 @@
+import json
+import os
+import re
+import time
+
+import cv2
+
+
+def camera_geometry(cap):
+    # 摄像头实际输出的分辨率，标定结果只在分辨率不变时复用
+    return {
+        'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+    }
+
+
+def _cache_path(cache_dir, user_id, camera_index):
+    safe_user = re.sub(r'[^0-9A-Za-z_-]', '_', str(user_id))
+    return os.path.join(cache_dir, f"{safe_user}_cam{camera_index}.json")
+
+
+def load_calibration(cache_dir, user_id, camera_index, geometry, max_age_days):
+    """
+    读取缓存的标准坐姿。
+
+    参数：
+    cache_dir：字符串
+        缓存目录。
+    user_id：字符串
+        用户标识。
+    camera_index：整数
+        摄像头编号。
+    geometry：字典
+        当前摄像头分辨率，由 camera_geometry 得到。
+    max_age_days：浮点数
+        缓存有效天数。
+
+    返回值：
+    字典或None
+        标准坐姿字典；缓存不存在、已过期或摄像头分辨率变化时返回None。删除缓存文件即可强制重新标定。
+    """
+    path = _cache_path(cache_dir, user_id, camera_index)
+    try:
+        with open(path, encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if cached.get('geometry') != geometry:
+        print(f"摄像头分辨率已变化，重新标定: {cached.get('geometry')} -> {geometry}")
+        return None
+    if time.time() - cached.get('created_at', 0) > max_age_days * 86400:
+        print("标定结果已过期，重新标定")
+        return None
+    return cached.get('standard_pose') or None
+
+
+def save_calibration(cache_dir, user_id, camera_index, geometry, standard_pose, num_frames):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _cache_path(cache_dir, user_id, camera_index)
+    cached = {
+        'user_id': user_id,
+        'camera_index': camera_index,
+        'geometry': geometry,
+        'created_at': time.time(),
+        'num_frames': num_frames,
+        'standard_pose': standard_pose,
+    }
+    # 先写临时文件再替换，避免中途退出留下不完整的缓存
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cached, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
@@ -0,0 +1,217 @@
+"""
+检测线程的 CPU 占用控制。检测与用户自己的程序运行在同一台电脑上，需要限制推理占用的资源：
+
+- apply_limits 设置 torch 的计算线程数与算子间线程数、检测线程的优先级，以及可选的 CPU 绑定；
+- Governor 测量每次检测消耗的 CPU 时间，按占用单核的百分比上限拉长两次检测的间隔。
+
+Linux 上优先级与 CPU 绑定都属于线程，只作用于检测线程以及之后由它创建的 torch 计算线程，Web 服务的线程不受影响；
+其他平台只能设置整个进程，安装了 psutil（可选）时使用 psutil，否则使用 os.nice。
+"""
+import os
+import sys
+import threading
+import time
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# nice 值与 CPU 绑定是否按线程设置
+_PER_THREAD = sys.platform.startswith('linux')
+
+
+def _set_priority(nice):
+    # 只降低优先级：已经低于 nice 时保持不变，提高优先级通常需要管理员权限
+    if _PER_THREAD:
+        tid = threading.get_native_id()
+        current = os.getpriority(os.PRIO_PROCESS, tid)
+        if nice > current:
+            os.setpriority(os.PRIO_PROCESS, tid, nice)
+        return True
+    if psutil is not None:
+        process = psutil.Process()
+        if os.name == 'nt':
+            if nice > 0:
+                process.nice(psutil.BELOW_NORMAL_PRIORITY_CLASS)
+        elif nice > process.nice():
+            process.nice(nice)
+        return True
+    if hasattr(os, 'nice'):
+        # os.nice 是在当前值上增加
+        current = os.nice(0)
+        if nice > current:
+            os.nice(nice - current)
+        return True
+    return False
+
+
+def _set_affinity(cpus):
+    if hasattr(os, 'sched_setaffinity'):
+        # pid 为 0 时设置调用线程
+        os.sched_setaffinity(0, set(cpus))
+        return True
+    if psutil is not None and hasattr(psutil.Process, 'cpu_affinity'):
+        psutil.Process().cpu_affinity(list(cpus))
+        return True
+    return False
+
+
+def _thread_cpu_times():
+    # 当前进程各线程累计的 CPU 时间 {系统线程号: 秒}；无法获取时返回空字典
+    if _PER_THREAD:
+        ticks = os.sysconf('SC_CLK_TCK')
+        res = {}
+        for name in os.listdir('/proc/self/task'):
+            try:
+                with open(f'/proc/self/task/{name}/stat') as f:
+                    # 线程名可能包含空格，从最后一个右括号之后按空格切分；utime、stime 为第14、15个字段
+                    fields = f.read().rsplit(')', 1)[1].split()
+            except OSError:
+                # 线程已退出
+                continue
+            res[int(name)] = (int(fields[11]) + int(fields[12])) / ticks
+        return res
+    if psutil is not None:
+        try:
+            return {t.id: t.user_time + t.system_time for t in psutil.Process().threads()}
+        except psutil.Error:
+            return {}
+    return {}
+
+
+def apply_limits(torch_threads, interop_threads, nice, affinity):
+    """
+    在检测线程中、加载模型之前调用，限制检测使用的 CPU 资源。各项设置失败时只打印提示，不影响检测。
+
+    参数：
+    torch_threads：整数
+        torch 算子内部的并行线程数，0 表示不修改。
+    interop_threads：整数
+        torch 算子之间的并行线程数，0 表示不修改；torch 开始计算后不能再修改。
+    nice：整数
+        优先级（nice 值，越大优先级越低），0 表示不修改；Windows 下大于 0 时把进程设为“低于正常”。
+    affinity：列表
+        可使用的 CPU 编号，空列表表示不绑定。
+    """
+    import torch
+
+    if torch_threads:
+        torch.set_num_threads(torch_threads)
+    if interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError as e:
+            print(f"无法设置 torch 算子间线程数: {e}")
+    if nice:
+        try:
+            if not _set_priority(nice):
+                print("当前平台不支持设置优先级，可安装 psutil")
+        except (OSError, ValueError) as e:
+            print(f"设置优先级失败: {e}")
+    if affinity:
+        try:
+            if not _set_affinity(affinity):
+                print("当前平台不支持绑定 CPU，可安装 psutil")
+        except (OSError, ValueError) as e:
+            print(f"绑定 CPU 失败: {e}")
+    print(f"检测线程资源限制：torch 线程 {torch.get_num_threads()}，算子间线程 {torch.get_num_interop_threads()}，"
+          f"nice {nice}，CPU {list(affinity) or '不限'}")
+
+
+class Governor:
+    """
+    按 CPU 占用限制检测频率。
+
+    每次检测前调用 begin，检测后调用 throttle：测量这次检测中检测线程与 torch 计算线程消耗的 CPU 时间，
+    取指数滑动平均后计算满足“占用不超过单核 max_cpu_percent%”所需的检测周期，不足的部分 sleep 补齐；
+    周期不短于 min_interval。
+
+    torch 的计算线程在第一次推理时由检测线程创建，之后一直复用：启动写入线程等服务线程之后、加载模型之前
+    在检测线程中调用 track_workers，此后第一次做了推理（throttle 传入 inferred=True）的检测中，新出现且消耗了
+    CPU 时间的线程即视为计算线程；其他线程（如短暂的 HTTP 请求线程）不计入。
+    无法获取各线程 CPU 时间的平台（没有 psutil 的 Windows 等）只计入检测线程自身。
+    """
+
+    def __init__(self, max_cpu_percent, min_interval, alpha=0.3):
+        self.max_share = max_cpu_percent / 100
+        self.min_interval = min_interval
+        self.alpha = alpha
+        self.lock = threading.Lock()
+        self.cycle_cpu = None
+        self.start = None
+        self.baseline = None
+        # 确定计算线程之前，每次检测开始时各线程的 CPU 时间
+        self.cycle_threads = None
+        self.workers = frozenset()
+        self.stats = {'cycles': 0, 'cpu_seconds': 0.0, 'wall_seconds': 0.0, 'throttled_seconds': 0.0,
+                      'last_period': 0.0, 'last_cpu': 0.0, 'workers': 0}
+
+    def track_workers(self):
+        # 记录加载模型之前已有的线程
+        self.baseline = set(_thread_cpu_times())
+        self.workers = frozenset()
+
+    def _cpu_time(self):
+        cpu = time.thread_time()
+        if self.workers:
+            cpu += sum(seconds for tid, seconds in _thread_cpu_times().items() if tid in self.workers)
+        return cpu
+
+    def begin(self):
+        if self.baseline is not None:
+            self.cycle_threads = _thread_cpu_times()
+        self.start = (time.perf_counter(), self._cpu_time())
+
+    def period(self):
+        # 当前的检测周期（秒）
+        if self.cycle_cpu is None:
+            return self.min_interval
+        return max(self.min_interval, self.cycle_cpu / self.max_share)
+
+    def throttle(self, inferred=True):
+        """
+        结束一次检测并 sleep 到下一次检测的时间，返回 sleep 的秒数。inferred 为这次检测是否运行了网络推理。
+        """
+        wall = time.perf_counter() - self.start[0]
+        # 计算线程退出时其 CPU 时间不再计入，差值可能为负
+        cpu = max(0.0, self._cpu_time() - self.start[1])
+        if self.baseline is not None and inferred:
+            # 第一次推理之后确定计算线程，这次检测中计算线程的消耗没有计入
+            before = self.cycle_threads
+            self.workers = frozenset(tid for tid, seconds in _thread_cpu_times().items()
+                                     if tid not in self.baseline and tid != threading.get_native_id()
+                                     and seconds > before.get(tid, 0.0))
+            self.baseline = self.cycle_threads = None
+        self.cycle_cpu = cpu if self.cycle_cpu is None else self.alpha * cpu + (1 - self.alpha) * self.cycle_cpu
+        period = self.period()
+        delay = max(0.0, period - wall)
+        # 只把超出 min_interval 的等待计为限流
+        throttled = max(0.0, delay - max(0.0, self.min_interval - wall))
+        with self.lock:
+            self.stats['cycles'] += 1
+            self.stats['cpu_seconds'] += cpu
+            self.stats['wall_seconds'] += wall + delay
+            self.stats['throttled_seconds'] += throttled
+            self.stats['last_period'] = max(period, wall)
+            self.stats['last_cpu'] = cpu
+            self.stats['workers'] = len(self.workers)
+        time.sleep(delay)
+        return delay
+
+    def metrics(self):
+        with self.lock:
+            stats = dict(self.stats)
+        wall = stats.pop('wall_seconds')
+        return {
+            'cycles': stats['cycles'],
+            # 检测占用单核的百分比：全部检测周期的平均值与最近一次
+            'cpu_percent': round(stats['cpu_seconds'] / wall * 100, 1) if wall else 0.0,
+            'last_cpu_percent': round(stats['last_cpu'] / stats['last_period'] * 100, 1) if stats['last_period'] else 0.0,
+            'max_cpu_percent': round(self.max_share * 100, 1),
+            'last_cycle_cpu_ms': round(stats['last_cpu'] * 1000, 1),
+            'period_s': round(stats['last_period'], 3),
+            'throttled_s': round(stats['throttled_seconds'], 3),
+            # 计入 CPU 时间的 torch 计算线程数
+            'workers': stats['workers'],
+        }
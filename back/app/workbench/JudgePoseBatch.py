@@ -0,0 +1,88 @@
+import numpy as np
+
+from ..analyse.PoseMask import BAD_POSES_LIST
+
+# 参与判定的关键点，顺序与 OpenPoseWrapperclass.numberToWord 中非空项的出现顺序一致，
+# 最后两项为手部检测给出的手的位置（OpenPoseWrapperclass.handToWord）
+KEYPOINT_NAMES = ('nose', 'neck', 'right_shoulder', 'left_wrist', 'left_shoulder', 'right_wrist',
+                  'right_eye', 'left_eye', 'left_hand', 'right_hand')
+KEYPOINT_INDEX = {name: i for i, name in enumerate(KEYPOINT_NAMES)}
+
+# 不良坐姿类型的顺序与掩码的位顺序一致
+BAD_POSE_INDEX = {name: i for i, name in enumerate(BAD_POSES_LIST)}
+
+
+def keypoints_to_array(keypoints_list):
+    """
+    将若干帧的关键点字典转换为 (N, P, 2) 的 float64 数组，缺失的关键点以 NaN 填充。
+
+    参数：
+    keypoints_list：列表
+        每个元素为 get_keyPoints 返回的关键点字典，例如 {'nose': [x, y], ...}。
+
+    返回值：
+    np.ndarray
+        形状为 (N, len(KEYPOINT_NAMES), 2)，第二维顺序与 KEYPOINT_NAMES 一致。
+    """
+    points = np.full((len(keypoints_list), len(KEYPOINT_NAMES), 2), np.nan)
+    for n, keypoints in enumerate(keypoints_list):
+        for name, point in keypoints.items():
+            i = KEYPOINT_INDEX.get(name)
+            if i is not None:
+                points[n, i, 0] = point[0]
+                points[n, i, 1] = point[1]
+    return points
+
+
+def judge_pose_batch(rule_engine, points):
+    """
+    在一次向量化计算中对 N 帧关键点执行 rule_engine 的全部规则。
+
+    参数：
+    rule_engine：PoseRuleEngine
+        已设置标准坐姿的规则引擎。
+    points：np.ndarray
+        形状为 (N, len(KEYPOINT_NAMES), 2) 的关键点数组，缺失关键点为 NaN，可由 keypoints_to_array 得到。
+
+    返回值：
+    np.ndarray
+        形状为 (N, len(BAD_POSES_LIST)) 的布尔数组，列顺序与 BAD_POSES_LIST 一致。
+    """
+    return rule_engine.evaluate(np.asarray(points, dtype=np.float64))
+
+
+def batch_mismatches(rule_engine, points):
+    """
+    校验批量判定与逐帧判定（judge_pose 的做法）的结果一致，返回结果不同的帧的序号数组，一致时为空。
+    """
+    points = np.asarray(points, dtype=np.float64)
+    batch = judge_pose_batch(rule_engine, points)
+    single = np.array([judge_pose_batch(rule_engine, points[i:i + 1])[0] for i in range(len(points))],
+                      dtype=bool).reshape(batch.shape)
+    return np.flatnonzero((batch != single).any(axis=1))
+
+
+def flags_to_poses(row):
+    # 将 judge_pose_batch 结果中的一行转换为不良坐姿名称列表
+    return [BAD_POSES_LIST[i] for i in np.flatnonzero(row)]
+
+
+def window_counts(flags, window):
+    """
+    计算每一帧及其之前共 window 帧内各不良坐姿出现的次数，与逐帧更新的 PostureWindow 计数一致。
+
+    参数：
+    flags：np.ndarray
+        judge_pose_batch 返回的 (N, K) 布尔数组，按时间先后排列。
+    window：整数
+        窗口长度（帧数）。
+
+    返回值：
+    np.ndarray
+        形状为 (N, K) 的整数数组。
+    """
+    flags = np.asarray(flags)
+    cumsum = np.zeros((flags.shape[0] + 1, flags.shape[1]), dtype=np.int64)
+    np.cumsum(flags, axis=0, out=cumsum[1:])
+    start = np.maximum(np.arange(1, flags.shape[0] + 1) - window, 0)
+    return cumsum[1:] - cumsum[start]
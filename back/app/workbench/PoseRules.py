@@ -0,0 +1,286 @@
+import ast
+import json
+import os
+
+import numpy as np
+
+from .JudgePoseBatch import KEYPOINT_NAMES, KEYPOINT_INDEX, BAD_POSES_LIST, BAD_POSE_INDEX, keypoints_to_array
+from ..analyse.PoseMask import flags_to_masks
+
+# 规则表达式中允许调用的函数，全部为逐元素的 NumPy 运算
+RULE_FUNCTIONS = {
+    'abs': np.abs,
+    'sqrt': np.sqrt,
+    'atan': np.arctan,
+    'atan2': np.arctan2,
+    'degrees': np.degrees,
+    'hypot': np.hypot,
+    'min': np.minimum,
+    'max': np.maximum,
+    'where': np.where,
+}
+
+_BIN_OPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Mod)
+_CMP_OPS = (ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq)
+
+
+class _RuleCompiler(ast.NodeTransformer):
+    """
+    将规则表达式的语法树改写为可直接作用于 NumPy 数组的形式：
+    nose.y → nose_y，base.nose.y → base_nose_y，and/or/not 与连续比较 → np.logical_*。
+    同时校验表达式只包含允许的语法，并记录引用到的关键点与名称。
+    """
+
+    def __init__(self, names):
+        self.names = names
+        self.parts = set()
+        self.refs = set()
+
+    def visit_Expression(self, node):
+        node.body = self.visit(node.body)
+        return node
+
+    def visit_Attribute(self, node):
+        if node.attr not in ('x', 'y'):
+            raise ValueError(f"未知的坐标分量: {node.attr}")
+        target = node.value
+        prefix = ''
+        if isinstance(target, ast.Attribute) and isinstance(target.value, ast.Name) and target.value.id == 'base':
+            prefix = 'base_'
+            part = target.attr
+        elif isinstance(target, ast.Name):
+            part = target.id
+        else:
+            raise ValueError("关键点引用只能写作 part.x 或 base.part.x 的形式")
+        if part not in KEYPOINT_INDEX:
+            raise ValueError(f"未知的关键点: {part}")
+        self.parts.add(prefix + part)
+        return ast.copy_location(ast.Name(id=f"{prefix}{part}_{node.attr}", ctx=ast.Load()), node)
+
+    def visit_Name(self, node):
+        if node.id not in self.names:
+            raise ValueError(f"未定义的名称: {node.id}")
+        self.refs.add(node.id)
+        return node
+
+    def visit_Constant(self, node):
+        if not isinstance(node.value, (int, float)) or isinstance(node.value, bool):
+            raise ValueError(f"不支持的常量: {node.value!r}")
+        return node
+
+    def visit_BinOp(self, node):
+        if not isinstance(node.op, _BIN_OPS):
+            raise ValueError(f"不支持的运算符: {type(node.op).__name__}")
+        return self.generic_visit(node)
+
+    def visit_UnaryOp(self, node):
+        node.operand = self.visit(node.operand)
+        if isinstance(node.op, ast.Not):
+            return ast.copy_location(self._call('logical_not', [node.operand]), node)
+        if not isinstance(node.op, (ast.USub, ast.UAdd)):
+            raise ValueError(f"不支持的运算符: {type(node.op).__name__}")
+        return node
+
+    def visit_BoolOp(self, node):
+        func = 'logical_and' if isinstance(node.op, ast.And) else 'logical_or'
+        values = [self.visit(v) for v in node.values]
+        res = values[0]
+        for value in values[1:]:
+            res = self._call(func, [res, value])
+        return ast.copy_location(res, node)
+
+    def visit_Compare(self, node):
+        left = self.visit(node.left)
+        comparators = [self.visit(c) for c in node.comparators]
+        pairs = []
+        for op, right in zip(node.ops, comparators):
+            if not isinstance(op, _CMP_OPS):
+                raise ValueError(f"不支持的比较运算: {type(op).__name__}")
+            pairs.append(ast.Compare(left=left, ops=[op], comparators=[right]))
+            left = right
+        res = pairs[0]
+        for pair in pairs[1:]:
+            res = self._call('logical_and', [res, pair])
+        return ast.copy_location(res, node)
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in RULE_FUNCTIONS or node.keywords:
+            raise ValueError("只能调用内置的规则函数: " + ', '.join(RULE_FUNCTIONS))
+        node.args = [self.visit(a) for a in node.args]
+        return node
+
+    def generic_visit(self, node):
+        if not isinstance(node, (ast.Expression, ast.BinOp, ast.Load) + _BIN_OPS):
+            raise ValueError(f"不支持的语法: {type(node).__name__}")
+        return super().generic_visit(node)
+
+    @staticmethod
+    def _call(func, args):
+        return ast.Call(func=ast.Attribute(value=ast.Name(id='np', ctx=ast.Load()), attr=func, ctx=ast.Load()),
+                        args=args, keywords=[])
+
+
+def _compile_expr(source, names, filename):
+    tree = ast.parse(source, mode='eval')
+    compiler = _RuleCompiler(names)
+    tree = ast.fix_missing_locations(compiler.visit(tree))
+    return compile(tree, filename, 'eval'), compiler.parts, compiler.refs
+
+
+def compile_rules(spec):
+    """
+    将规则配置编译为向量化的判定器。
+
+    参数：
+    spec：字典
+        规则配置，包含：
+        "params"：阈值参数，名称可在表达式中直接引用；
+        "derived"：按顺序定义的中间量，如 {"eye_angle": "degrees(atan(...))"}，后面的表达式可以引用前面的中间量；
+        "rules"：规则列表，每条为 {"label": 不良坐姿名称, "when": 布尔表达式, "enabled": 是否启用}。
+        表达式中 nose.x / nose.y 表示当前帧的关键点坐标，base.nose.x / base.nose.y 表示标定得到的标准坐姿坐标。
+
+    返回值：
+    CompiledRules
+        编译后的规则集。表达式有误时抛出 ValueError。
+    """
+    params = {name: float(value) for name, value in spec.get('params', {}).items()}
+    names = set(params) | set(RULE_FUNCTIONS)
+
+    derived = []
+    # 每个中间量依赖的关键点（包含其引用的中间量的依赖）
+    derived_parts = {}
+    for name, source in spec.get('derived', {}).items():
+        code, parts, refs = _compile_expr(source, names, f"<derived:{name}>")
+        for ref in refs:
+            parts |= derived_parts.get(ref, set())
+        derived.append((name, code))
+        derived_parts[name] = parts
+        names.add(name)
+
+    rules = []
+    for rule in spec.get('rules', []):
+        if not rule.get('enabled', True):
+            continue
+        label = rule['label']
+        if label not in BAD_POSE_INDEX:
+            raise ValueError(f"未知的不良坐姿类型: {label}")
+        code, parts, refs = _compile_expr(rule['when'], names, f"<rule:{label}>")
+        for ref in refs:
+            parts |= derived_parts.get(ref, set())
+        rules.append((BAD_POSE_INDEX[label], code, sorted(parts)))
+
+    return CompiledRules(params, derived, rules)
+
+
+class CompiledRules:
+    def __init__(self, params, derived, rules):
+        self.params = params
+        self.derived = derived
+        self.rules = rules
+
+    def evaluate(self, points, baseline):
+        """
+        对 (N, P, 2) 的关键点数组执行全部规则。
+
+        参数：
+        points：np.ndarray
+            由 keypoints_to_array 得到的关键点数组，缺失关键点为 NaN。
+        baseline：np.ndarray
+            形状为 (P, 2) 的标准坐姿坐标，缺失关键点为 NaN。
+
+        返回值：
+        np.ndarray
+            形状为 (N, len(BAD_POSES_LIST)) 的布尔数组。某条规则引用的关键点（含标准坐姿）缺失时该规则不触发。
+        """
+        points = np.asarray(points, dtype=np.float64)
+        n = points.shape[0]
+        env = {'np': np, **RULE_FUNCTIONS, **self.params}
+        present = {}
+        for name, i in KEYPOINT_INDEX.items():
+            env[f"{name}_x"] = points[:, i, 0]
+            env[f"{name}_y"] = points[:, i, 1]
+            env[f"base_{name}_x"] = baseline[i, 0]
+            env[f"base_{name}_y"] = baseline[i, 1]
+            present[name] = ~np.isnan(points[:, i, 0])
+            present[f"base_{name}"] = not np.isnan(baseline[i, 0])
+
+        flags = np.zeros((n, len(BAD_POSES_LIST)), dtype=bool)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for name, code in self.derived:
+                env[name] = eval(code, {'__builtins__': {}}, env)
+            for index, code, parts in self.rules:
+                fired = np.broadcast_to(np.asarray(eval(code, {'__builtins__': {}}, env), dtype=bool), (n,))
+                for part in parts:
+                    fired = fired & present[part]
+                flags[:, index] |= fired
+        return flags
+
+
+def baseline_to_array(standardPose):
+    # 将 get_standard_pose 返回的标准坐姿字典转换为 (P, 2) 数组
+    baseline = np.full((len(KEYPOINT_NAMES), 2), np.nan)
+    for name, point in (standardPose or {}).items():
+        i = KEYPOINT_INDEX.get(name)
+        if i is not None:
+            baseline[i] = point[:2]
+    return baseline
+
+
+class PoseRuleEngine:
+    """
+    从 JSON 文件加载坐姿规则。规则文件修改后，下一次检测前自动重新编译，
+    无需重启检测线程或重新加载模型；新规则编译或试算失败时继续使用旧规则。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = None
+        self.rules = None
+        self.baseline = baseline_to_array(None)
+        self._standard_pose = None
+        self.maybe_reload()
+
+    def maybe_reload(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError as e:
+            if self.rules is None:
+                raise
+            print(f"无法读取坐姿规则文件: {e}")
+            return False
+        if mtime == self.mtime:
+            return False
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                rules = compile_rules(json.load(f))
+            # 用当前的标准坐姿试算一次：没有检测到关键点的帧与处于标准坐姿的帧，
+            # 表达式中的类型错误、未知函数等只在求值时才会出现
+            rules.evaluate(np.stack([np.full_like(self.baseline, np.nan), self.baseline]), self.baseline)
+        except Exception as e:
+            # 结构不对的规则文件（如 "params": [] 或 "when": 5）或求值出错的规则会抛出各种异常，一律保留旧规则，
+            # 并记录修改时间，文件再次修改前不重复编译
+            if self.rules is None:
+                raise
+            print(f"坐姿规则编译或试算失败，继续使用旧规则: {e}")
+            self.mtime = mtime
+            return False
+        self.rules = rules
+        self.mtime = mtime
+        print(f"已加载坐姿规则: {self.path}")
+        return True
+
+    def set_baseline(self, standardPose):
+        if standardPose is not self._standard_pose:
+            self._standard_pose = standardPose
+            self.baseline = baseline_to_array(standardPose)
+
+    def evaluate(self, points):
+        return self.rules.evaluate(points, self.baseline)
+
+    def judge_masks(self, points):
+        # 批量判定，返回每帧的不良坐姿掩码
+        return flags_to_masks(self.evaluate(points))
+
+    def judge(self, keyPoints):
+        # 判定单帧，返回不良坐姿掩码
+        return int(self.judge_masks(keypoints_to_array([keyPoints]))[0])
@@ -0,0 +1,38 @@
+import threading
+
+
+class EpisodeTracker:
+    """
+    把逐次检测结果压缩为坐姿片段 (start_ts, end_ts, posture_mask, samples)。
+
+    连续的相同掩码合并为一个片段，只在坐姿变化时把上一个片段交给 sink 写出；
+    两次检测间隔超过 max_gap 秒（如检测中断）或片段长度达到 max_seconds 秒时也会结束当前片段，
+    以限制异常退出时丢失的数据量。
+    """
+
+    def __init__(self, sink, max_gap, max_seconds):
+        self.sink = sink
+        self.max_gap = max_gap
+        self.max_seconds = max_seconds
+        self.current = None
+        self.lock = threading.Lock()
+
+    def add(self, ts, mask):
+        # ts 为整数秒级时间戳，mask 为不良坐姿掩码
+        with self.lock:
+            cur = self.current
+            if cur is not None and cur[2] == mask and ts - cur[1] <= self.max_gap \
+                    and ts - cur[0] < self.max_seconds:
+                cur[1] = ts
+                cur[3] += 1
+                return
+            if cur is not None:
+                self.sink(tuple(cur))
+            self.current = [ts, ts, mask, 1]
+
+    def flush(self):
+        # 写出尚未结束的片段（进程退出时调用）
+        with self.lock:
+            if self.current is not None:
+                self.sink(tuple(self.current))
+                self.current = None
@@ -0,0 +1,151 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+
+from config import config
+from ..analyse.Archive import archive_new
+from ..storage import get_storage
+
+# 停止写入线程的哨兵
+_STOP = object()
+
+
+class PostureWriter:
+    """
+    坐姿片段（posture_episode）的异步批量写入器。
+
+    检测线程调用 write 只把数据放入内存队列，由后台线程攒够 flush_rows 条或等待满 flush_interval_ms 毫秒后，
+    用一条多行 INSERT 写入并提交一次。数据库不可用或队列已满时，数据追加到本地溢出文件，
+    数据库恢复后在下一次写入前补写；进程退出时会把剩余数据全部写出。
+    """
+
+    def __init__(self, flush_rows, flush_interval_ms, max_queue, spill_path):
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval_ms / 1000
+        self.spill_path = spill_path
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.spill_lock = threading.Lock()
+        self.thread = None
+        self.stats = {'rows': 0, 'commits': 0, 'spilled': 0, 'errors': 0}
+        # 下一次维护分区与过期数据的时间
+        self.next_maintain = 0
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name='posture-writer', daemon=True)
+            self.thread.start()
+            atexit.register(self.stop)
+
+    def write(self, row):
+        # 不阻塞检测线程：队列满时直接写入溢出文件
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            self._spill([row])
+
+    def stop(self, timeout=10):
+        if self.thread is None or not self.thread.is_alive():
+            return
+        self.queue.put(_STOP)
+        self.thread.join(timeout)
+
+    def _run(self):
+        buffer = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._flush(buffer)
+                return
+            if item is not None:
+                buffer.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if buffer and (len(buffer) >= self.flush_rows or time.monotonic() >= deadline):
+                self._flush(buffer)
+                buffer = []
+                deadline = None
+
+    def _flush(self, rows):
+        try:
+            # 先补写之前溢出到磁盘的数据，保持写入顺序
+            self._replay_spill()
+            if rows:
+                self._insert(rows)
+        except Exception as e:
+            print(f"写入坐姿数据失败，暂存到本地: {str(e)}")
+            self.stats['errors'] += 1
+            self._spill(rows)
+            return
+        self._maybe_maintain()
+
+    def _maybe_maintain(self):
+        # 每小时在写入线程中维护一次分区、清理过期数据并更新归档
+        if time.monotonic() < self.next_maintain:
+            return
+        self.next_maintain = time.monotonic() + 3600
+        try:
+            get_storage().maintain_partitions()
+            if config.ARCHIVE_ENABLED:
+                # 顺带把新片段追加到 Parquet 归档
+                archive_new(get_storage())
+        except Exception as e:
+            print(f"维护坐姿数据分区失败: {str(e)}")
+
+    def _insert(self, rows):
+        # 同一批数据在一个事务中写入；MySQL 下 executemany 会改写为一条多行插入
+        get_storage().insert_posture_episodes(rows)
+        self.stats['rows'] += len(rows)
+        self.stats['commits'] += 1
+
+    def _spill(self, rows):
+        if not rows:
+            return
+        with self.spill_lock:
+            os.makedirs(os.path.dirname(self.spill_path), exist_ok=True)
+            with open(self.spill_path, 'a', encoding='utf-8') as f:
+                for row in rows:
+                    f.write(json.dumps(list(row)) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+        self.stats['spilled'] += len(rows)
+
+    def _replay_spill(self):
+        # 持锁时只把溢出文件转移为待补写文件，补写过程不持锁，检测线程追加溢出数据时不会等待数据库
+        replay_path = self.spill_path + '.replay'
+        with self.spill_lock:
+            if os.path.exists(self.spill_path):
+                with open(self.spill_path, encoding='utf-8') as src, open(replay_path, 'a', encoding='utf-8') as dst:
+                    dst.write(src.read())
+                os.remove(self.spill_path)
+        if not os.path.exists(replay_path):
+            return
+
+        with open(replay_path, encoding='utf-8') as f:
+            rows = [tuple(json.loads(line)) for line in f if line.strip()]
+        done = 0
+        try:
+            for i in range(0, len(rows), self.flush_rows):
+                chunk = rows[i:i + self.flush_rows]
+                self._insert(chunk)
+                done += len(chunk)
+        finally:
+            # 只保留尚未写入的数据，避免下次补写时重复插入
+            if done == len(rows):
+                os.remove(replay_path)
+            else:
+                tmp_path = replay_path + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    for row in rows[done:]:
+                        f.write(json.dumps(list(row)) + '\n')
+                os.replace(tmp_path, replay_path)
+        print(f"已补写 {done} 条本地暂存的坐姿数据")
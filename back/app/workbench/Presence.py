@@ -0,0 +1,56 @@
+import threading
+
+
+class PresenceGate:
+    """
+    判断座位上是否有人，无人时跳过完整的姿态估计。
+
+    有人时不做额外推理：完整推理检测到人即为有人，连续 absent_cycles 次检测不到人才判定为离开。
+    离开后每次检测只用 Body.presence 在 input_height 的小尺寸上计算第一阶段的脖子热图，峰值达到 threshold
+    即判定为回到座位，同一次检测中继续做完整推理，因此坐下后的第一次检测就会恢复。
+    """
+
+    def __init__(self, threshold, absent_cycles, input_height):
+        self.threshold = threshold
+        self.absent_cycles = absent_cycles
+        self.input_height = input_height
+        self.present = True
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.stats = {'full_runs': 0, 'gate_runs': 0, 'skipped': 0, 'last_score': None}
+
+    def should_run(self, body, image):
+        # 本次检测是否需要完整推理
+        if self.present:
+            with self.lock:
+                self.stats['full_runs'] += 1
+            return True
+        score = body.presence(image, self.input_height)
+        with self.lock:
+            self.stats['gate_runs'] += 1
+            self.stats['last_score'] = round(score, 4)
+            if score < self.threshold:
+                self.stats['skipped'] += 1
+                return False
+            self.stats['full_runs'] += 1
+        print("检测到用户回到座位，恢复坐姿检测")
+        self.present = True
+        # 完整推理没有检测到人时（误判）立即回到无人状态
+        self.misses = self.absent_cycles - 1
+        return True
+
+    def update(self, found):
+        # 完整推理之后调用，found 为是否检测到人
+        if found:
+            self.misses = 0
+            return
+        self.misses += 1
+        if self.present and self.misses >= self.absent_cycles:
+            self.present = False
+            print("座位无人，暂停坐姿检测与记录")
+
+    def metrics(self):
+        with self.lock:
+            res = dict(self.stats)
+        res['present'] = self.present
+        return res
@@ -0,0 +1,106 @@
+import threading
+
+import cv2
+import numpy as np
+
+from ..openpose.util import draw_bodypose
+
+
+class PreviewHub:
+    """
+    检测画面的 MJPEG 预览。
+
+    检测线程每帧调用 publish；没有观看者时直接返回，不保存画面也不编码。有观看者时保存最新一帧，
+    由第一个需要该帧的观看者绘制骨架并编码为 JPEG，同时需要该帧的其他观看者等待编码完成，
+    每帧只编码一次，编码结果供所有观看者共用。
+    """
+
+    def __init__(self, quality):
+        self.quality = quality
+        self.viewers = 0
+        self.version = 0
+        self.frame = None
+        self.jpeg = None
+        self.jpeg_version = -1
+        # 正在编码的画面版本，没有观看者在编码时为 -1
+        self.encoding = -1
+        self.cond = threading.Condition()
+        self.stats = {'published': 0, 'encoded': 0}
+
+    def publish(self, oriImg, candidate, subset):
+        if not self.viewers:
+            return
+        with self.cond:
+            self.frame = (oriImg, candidate, subset)
+            self.version += 1
+            self.stats['published'] += 1
+            self.cond.notify_all()
+
+    def _encode(self, frame):
+        # 在副本上绘制，不修改检测线程的画面
+        image, candidate, subset = frame
+        image = draw_bodypose(image.copy(), candidate, subset)
+        ok, buf = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        return buf.tobytes() if ok else None
+
+    @staticmethod
+    def _part(jpeg):
+        return (b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: ' +
+                str(len(jpeg)).encode() + b'\r\n\r\n' + jpeg + b'\r\n')
+
+    def _keepalive(self):
+        # 没有新画面时重发的分块：最近一帧，尚未编码过画面时为一个黑色像素
+        with self.cond:
+            jpeg = self.jpeg
+        if jpeg is None:
+            ok, buf = cv2.imencode('.jpg', np.zeros((1, 1, 3), dtype=np.uint8))
+            jpeg = buf.tobytes()
+        return jpeg
+
+    def stream(self, timeout=5):
+        """
+        multipart/x-mixed-replace 响应体的生成器，每有一帧新画面产出一个 JPEG 分块。
+        超过 timeout 秒没有新画面（检测停止或座位无人）时重发一个分块，写入失败时服务器才能发现客户端已断开；
+        生成器结束（客户端断开）时观看者计数减一。
+        """
+        with self.cond:
+            self.viewers += 1
+        try:
+            last = -1
+            while True:
+                with self.cond:
+                    fresh = self.cond.wait_for(lambda: self.version != last and self.frame is not None, timeout)
+                    frame = None
+                    if fresh:
+                        last = self.version
+                        if self.jpeg_version != last and self.encoding == last:
+                            # 其他观看者正在编码这一帧；编码失败或开始编码更新的帧时不再等待
+                            self.cond.wait_for(lambda: self.jpeg_version >= last or self.encoding != last, timeout)
+                        elif self.jpeg_version != last:
+                            self.encoding = last
+                            frame = self.frame
+                        jpeg = self.jpeg
+                if not fresh:
+                    # 生成器在 yield 处暂停，不能持锁
+                    yield self._part(self._keepalive())
+                    continue
+                if frame is not None:
+                    # 编码不持锁，检测线程发布新帧时不必等待
+                    jpeg = None
+                    try:
+                        jpeg = self._encode(frame)
+                    finally:
+                        with self.cond:
+                            if jpeg and self.jpeg_version < last:
+                                self.jpeg, self.jpeg_version = jpeg, last
+                                self.stats['encoded'] += 1
+                            if self.encoding == last:
+                                self.encoding = -1
+                            self.cond.notify_all()
+                if jpeg:
+                    yield self._part(jpeg)
+        finally:
+            with self.cond:
+                self.viewers -= 1
+                if not self.viewers:
+                    self.frame = None
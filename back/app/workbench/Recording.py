@@ -0,0 +1,262 @@
+"""
+关键点录制与回放。录下真实使用时的关键点序列，调整坐姿规则或提醒参数后直接在录制数据上回放，
+不需要摄像头和 OpenPose，数小时的数据几秒内即可重新判定。
+
+文件格式（小端序，只追加写入，各部分按 8 字节对齐，可整体内存映射）：
+
+    文件头：magic 8 字节 b'PGKPREC1' | meta_len u32 | 保留 u32 | meta（UTF-8 JSON，空格补齐到 8 字节的倍数）
+    数据块：tag 4 字节 b'CHNK' | count u32 | payload_len u64 | payload
+    payload：ts f64[count] | points f32[count, P, 2] | mask u16[count]（补齐到 8 字节的倍数）
+
+meta 记录关键点名称 names（P 个，决定 points 第二维的顺序）、录制开始时的标准坐姿 standard_pose 与开始时间。
+points 中缺失的关键点为 NaN，mask 为录制时的判定结果。进程异常退出时最后一个数据块可能不完整，读取时忽略。
+
+回放（在 back 目录下）：
+    python -m app.workbench.Recording data/recordings/*.pgrec [--rules config/pose_rules.json]
+"""
+import argparse
+import json
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from config import config
+from ..analyse.PoseMask import BAD_POSES_LIST, flags_to_masks, mask_counts, masks_to_flags
+from .JudgePoseBatch import KEYPOINT_NAMES, batch_mismatches, window_counts
+from .PoseRules import PoseRuleEngine
+
+MAGIC = b'PGKPREC1'
+CHUNK_TAG = b'CHNK'
+_FILE_HEADER = struct.Struct('<8sII')
+_CHUNK_HEADER = struct.Struct('<4sIQ')
+
+
+def _pad8(n):
+    return -(-n // 8) * 8
+
+
+class Recorder:
+    """
+    关键点录制。add 只把一帧放入内存，攒够 chunk_frames 帧、最早的一帧已等待 max_age 秒（0 表示不限）
+    或调用 flush 时作为一个数据块追加到文件。检测频率较低时 chunk_frames 帧可能要攒很久，max_age 限制了异常退出时丢失的帧。
+    """
+
+    def __init__(self, path, meta=None, names=KEYPOINT_NAMES, chunk_frames=256, max_age=0):
+        self.path = path
+        self.names = tuple(names)
+        self.chunk_frames = chunk_frames
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.pending = []
+        # 内存中最早一帧的加入时间（time.monotonic）
+        self.pending_since = None
+        self.frames = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            meta = json.dumps({'version': 1, 'names': list(self.names), 'created_at': time.time(), **(meta or {})},
+                              ensure_ascii=False).encode('utf-8')
+            meta += b' ' * (_pad8(len(meta)) - len(meta))
+            self.file.write(_FILE_HEADER.pack(MAGIC, len(meta), 0) + meta)
+            self.file.flush()
+
+    def add(self, ts, points, mask):
+        # points 为 (P, 2) 的关键点数组，顺序与 names 一致，缺失为 NaN
+        with self.lock:
+            if not self.pending:
+                self.pending_since = time.monotonic()
+            self.pending.append((ts, points, mask))
+            if len(self.pending) >= self.chunk_frames or self._expired():
+                self._write_chunk()
+
+    def maybe_flush(self):
+        # 没有新帧（如座位无人）时由调用方定期调用，最早的一帧等待超过 max_age 秒时写出
+        with self.lock:
+            if self._expired():
+                self._write_chunk()
+
+    def _expired(self):
+        return bool(self.max_age and self.pending and time.monotonic() - self.pending_since >= self.max_age)
+
+    def flush(self):
+        with self.lock:
+            self._write_chunk()
+
+    def close(self):
+        with self.lock:
+            self._write_chunk()
+            self.file.close()
+
+    def _write_chunk(self):
+        if not self.pending or self.file.closed:
+            return
+        n = len(self.pending)
+        ts = np.array([row[0] for row in self.pending], dtype='<f8')
+        points = np.array([row[1] for row in self.pending], dtype='<f4').reshape(n, len(self.names), 2)
+        masks = np.array([row[2] for row in self.pending], dtype='<u2').tobytes()
+        masks += b'\0' * (_pad8(len(masks)) - len(masks))
+        payload = ts.tobytes() + points.tobytes() + masks
+        # 一个数据块一次写入，中途退出最多留下一个不完整的块
+        self.file.write(_CHUNK_HEADER.pack(CHUNK_TAG, n, len(payload)) + payload)
+        self.file.flush()
+        self.frames += n
+        self.pending = []
+
+
+class Recording:
+    """
+    以内存映射方式读取录制文件。chunks 中每个数据块为 (ts, points, masks) 三个直接指向文件内容的只读数组，不复制数据。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.chunks = []
+        size = os.path.getsize(path)
+        if size < _FILE_HEADER.size:
+            raise ValueError(f"{path} 不是关键点录制文件")
+        self.data = np.memmap(path, dtype=np.uint8, mode='r')
+        magic, meta_len, _ = _FILE_HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} 不是关键点录制文件")
+        offset = _FILE_HEADER.size
+        self.meta = json.loads(bytes(self.data[offset:offset + meta_len]).decode('utf-8'))
+        self.names = tuple(self.meta['names'])
+        offset += meta_len
+
+        p = len(self.names)
+        while offset + _CHUNK_HEADER.size <= size:
+            tag, n, payload_len = _CHUNK_HEADER.unpack_from(self.data, offset)
+            start = offset + _CHUNK_HEADER.size
+            if tag != CHUNK_TAG or start + payload_len > size:
+                # 不完整的最后一个块
+                break
+            ts = np.frombuffer(self.data, dtype='<f8', count=n, offset=start)
+            points = np.frombuffer(self.data, dtype='<f4', count=n * p * 2, offset=start + 8 * n).reshape(n, p, 2)
+            masks = np.frombuffer(self.data, dtype='<u2', count=n, offset=start + 8 * n + 8 * n * p)
+            self.chunks.append((ts, points, masks))
+            offset = start + payload_len
+
+    def __len__(self):
+        return sum(len(chunk[0]) for chunk in self.chunks)
+
+    def arrays(self, names=KEYPOINT_NAMES):
+        """
+        合并全部数据块。
+
+        返回值：
+        元组 (ts, points, masks)：points 为 (N, len(names), 2) 的 float64 数组，按 names 的顺序重新排列，
+        录制时没有的关键点为 NaN（例如较早的录制中没有手部关键点），可直接交给 PoseRuleEngine.judge_masks。
+        """
+        if not self.chunks:
+            return np.empty(0), np.full((0, len(names), 2), np.nan), np.empty(0, dtype=np.uint16)
+        ts = np.concatenate([chunk[0] for chunk in self.chunks])
+        recorded = np.concatenate([chunk[1] for chunk in self.chunks])
+        masks = np.concatenate([chunk[2] for chunk in self.chunks])
+        points = np.full((len(ts), len(names), 2), np.nan)
+        index = {name: i for i, name in enumerate(self.names)}
+        for i, name in enumerate(names):
+            if name in index:
+                points[:, i] = recorded[:, index[name]]
+        return ts, points, masks
+
+
+def simulate_alerts(ts, masks, window_size, threshold, cooldown):
+    """
+    按 produce_alerts 的逻辑（内存窗口）模拟提醒：每个样本计入窗口后检查一次，距上次提醒不足 cooldown 秒时不提醒；
+    时间使用录制的时间戳。窗口计数由 window_counts 一次算出，只对达到阈值的样本逐个检查提醒间隔。
+
+    返回值：
+    列表 [(ts, 提醒掩码)]。
+    """
+    alert_masks = flags_to_masks(window_counts(masks_to_flags(masks), window_size) >= threshold)
+    alerts = []
+    last_alert = None
+    for i in np.flatnonzero(alert_masks):
+        t = float(ts[i])
+        if last_alert is not None and t - last_alert < cooldown:
+            continue
+        alerts.append((t, int(alert_masks[i])))
+        last_alert = t
+    return alerts
+
+
+def verify(paths, rule_engine):
+    """
+    在录制数据上校验批量判定与逐帧判定的结果一致，返回 {文件: 结果不同的帧数}。
+    """
+    res = {}
+    for path in paths:
+        recording = Recording(path)
+        _, points, _ = recording.arrays()
+        rule_engine.set_baseline(recording.meta.get('standard_pose'))
+        res[path] = len(batch_mismatches(rule_engine, points))
+    return res
+
+
+def replay(paths, rule_engine=None, standard_pose=None, window_size=None, threshold=None, cooldown=None):
+    """
+    在录制数据上重新判定坐姿并模拟提醒。各文件分别使用录制时的标准坐姿（或统一使用 standard_pose），提醒窗口按文件重新开始。
+
+    参数：
+    paths：列表
+        录制文件路径。
+    rule_engine：PoseRuleEngine
+        默认加载 POSE_RULES_PATH。
+    window_size、threshold、cooldown：整数
+        提醒窗口长度、触发次数与提醒间隔，默认取 ALERT_WINDOW_SIZE、ALERT_THRESHOLD、ALERT_COOLDOWN。
+
+    返回值：
+    字典
+        samples：样本数；seconds：录制覆盖的时长；counts：{不良坐姿: 帧数}；alerts：[(ts, 提醒掩码)]；
+        changed：判定结果与录制时不同的样本数；masks：每个文件重新判定的掩码数组列表。
+    """
+    rule_engine = rule_engine or PoseRuleEngine(config.POSE_RULES_PATH)
+    window_size = window_size or config.ALERT_WINDOW_SIZE
+    threshold = threshold or config.ALERT_THRESHOLD
+    cooldown = config.ALERT_COOLDOWN if cooldown is None else cooldown
+
+    res = {'samples': 0, 'seconds': 0.0, 'counts': dict.fromkeys(BAD_POSES_LIST, 0), 'alerts': [], 'changed': 0,
+           'masks': []}
+    for path in paths:
+        recording = Recording(path)
+        ts, points, recorded_masks = recording.arrays()
+        if not len(ts):
+            res['masks'].append(np.empty(0, dtype=np.uint16))
+            continue
+        rule_engine.set_baseline(standard_pose or recording.meta.get('standard_pose'))
+        masks = rule_engine.judge_masks(points)
+        res['samples'] += len(ts)
+        res['seconds'] += float(ts[-1] - ts[0])
+        for name, count in zip(BAD_POSES_LIST, mask_counts(masks)):
+            res['counts'][name] += int(count)
+        res['alerts'] += simulate_alerts(ts, masks, window_size, threshold, cooldown)
+        res['changed'] += int(np.count_nonzero(masks != recorded_masks))
+        res['masks'].append(masks)
+    return res
+
+
+def main():
+    parser = argparse.ArgumentParser(description='在关键点录制上回放坐姿判定与提醒')
+    parser.add_argument('paths', nargs='+', help='录制文件')
+    parser.add_argument('--rules', default=config.POSE_RULES_PATH, help='坐姿规则文件')
+    parser.add_argument('--verify', action='store_true', help='同时校验批量判定与逐帧判定的结果一致')
+    args = parser.parse_args()
+
+    rule_engine = PoseRuleEngine(args.rules)
+    if args.verify:
+        for path, mismatches in verify(args.paths, rule_engine).items():
+            print(f"{path}: 批量判定与逐帧判定不同的帧 {mismatches}")
+    start = time.perf_counter()
+    res = replay(args.paths, rule_engine)
+    elapsed = time.perf_counter() - start
+    print(f"回放 {res['samples']} 个样本（{res['seconds'] / 3600:.2f} 小时），用时 {elapsed:.2f} 秒")
+    print(f"与录制时判定不同的样本：{res['changed']}，提醒次数：{len(res['alerts'])}")
+    for name, count in res['counts'].items():
+        print(f"  {name}: {count}")
+
+
+if __name__ == '__main__':
+    main()
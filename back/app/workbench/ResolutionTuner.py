@@ -0,0 +1,207 @@
+"""
+摄像头采集尺寸与网络输入高度的自动调优。
+
+在本机上依次测量候选的采集尺寸与网络输入高度：每种采集尺寸采集一组画面，每个输入高度对这组画面测量推理耗时、
+关键点检出率、关键点抖动（相对肩宽）以及按坐姿规则逐帧判定的结果是否与最高精度设置一致。在判定结果与最高精度设置一致、
+检出率与抖动满足阈值的设置中选耗时最短的一个，保存到 RESOLUTION_DIR，检测线程启动时读取。
+调优期间请保持正常坐姿、不要离开座位。
+
+用法（在 back 目录下）：
+    python -m app.workbench.ResolutionTuner [--frames 20]
+"""
+import argparse
+import json
+import os
+import time
+import warnings
+
+import cv2
+import numpy as np
+
+from config import config
+from ..openpose import OpenPoseWrapperclass
+from .Calibration import camera_geometry
+from .JudgePoseBatch import KEYPOINT_INDEX, keypoints_to_array
+from .PoseRules import PoseRuleEngine
+
+
+def _profile_path(profile_dir, camera_index):
+    return os.path.join(profile_dir, f"cam{camera_index}.json")
+
+
+def load_resolution_profile(profile_dir, camera_index):
+    """
+    读取调优结果。
+
+    返回值：
+    字典或None
+        {'capture_size': [宽, 高], 'input_height': 整数, ...}；未调优或文件损坏时返回None，此时使用配置中的默认值。
+    """
+    try:
+        with open(_profile_path(profile_dir, camera_index), encoding='utf-8') as f:
+            profile = json.load(f)
+        return {**profile, 'capture_size': tuple(profile['capture_size']), 'input_height': int(profile['input_height'])}
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_resolution_profile(profile_dir, camera_index, profile):
+    os.makedirs(profile_dir, exist_ok=True)
+    path = _profile_path(profile_dir, camera_index)
+    # 先写临时文件再替换，避免中途退出留下不完整的文件
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def capture_frames(cap, size, frames, warmup=5):
+    # 按 size 设置采集尺寸并采集 frames 帧，返回摄像头实际的 (宽, 高) 与画面列表；前 warmup 帧用于等待曝光稳定，丢弃
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, size[0])
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, size[1])
+    geometry = camera_geometry(cap)
+    images = []
+    for i in range(warmup + frames):
+        ret, image = cap.read()
+        if ret and i >= warmup:
+            images.append(image)
+    return (geometry['width'], geometry['height']), images
+
+
+def _center(points):
+    # 各关键点位置的中位数，从未检测到的关键点为 NaN
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmedian(points, axis=0)
+
+
+def measure(openpose, images, input_height):
+    """
+    以 input_height 对一组画面做推理，返回该设置的测量结果与逐帧的关键点。
+
+    返回值：
+    元组
+        (result, points)。result 为字典，latency_ms：单帧推理耗时的中位数；detection：各身体关键点的检出率；
+        jitter：关键点位置标准差的最大值（以肩宽为单位）。points 为 keypoints_to_array 的 (帧数, P, 2) 数组。
+    """
+    body = openpose.body_estimation
+    body.input_height = input_height
+    body(images[0])  # 预热，分配该尺寸的缓冲区
+
+    latencies = []
+    keypoints_list = []
+    for image in images:
+        start = time.perf_counter()
+        candidate, subset = body(image)
+        latencies.append(time.perf_counter() - start)
+        keypoints_list.append(openpose.to_keypoints(candidate, subset))
+
+    points = keypoints_to_array(keypoints_list)
+    detected = ~np.isnan(points[:, :, 0])
+    names = [name for name in openpose.numberToWord if name]
+    detection = {name: float(detected[:, KEYPOINT_INDEX[name]].mean()) for name in names}
+
+    center = _center(points)
+    shoulder_width = abs(center[KEYPOINT_INDEX['left_shoulder'], 0] - center[KEYPOINT_INDEX['right_shoulder'], 0])
+    jitter = float('inf')
+    if shoulder_width > 0:
+        # 至少检测到两次的关键点才计算抖动
+        stable = detected.sum(axis=0) >= 2
+        jitter = float(np.nanstd(points[:, stable], axis=0).max(initial=0) / shoulder_width)
+
+    return {
+        'input_height': input_height,
+        'latency_ms': round(float(np.median(latencies)) * 1000, 2),
+        'detection': detection,
+        'jitter': round(jitter, 4),
+    }, points
+
+
+def acceptable(result, reference):
+    # 判定结果与参考设置一致，参考设置稳定检出的关键点在该设置下同样稳定检出，抖动满足阈值
+    if result['mask'] != reference['mask'] or result['agreement'] < config.RESOLUTION_MIN_STABILITY:
+        return False
+    if result['jitter'] > config.RESOLUTION_MAX_JITTER:
+        return False
+    return all(result['detection'][name] >= config.RESOLUTION_MIN_DETECTION
+               for name, rate in reference['detection'].items() if rate >= config.RESOLUTION_MIN_DETECTION)
+
+
+def tune(openpose, rule_engine, frames):
+    """
+    测量全部候选设置并选出耗时最短的可接受设置。输入高度超过采集高度两倍的组合只是放大，不会提供更多细节，不参与测量。
+
+    采集尺寸与输入高度都最大的设置作为参考，其关键点的中位数作为所有设置共用的标准坐姿（按采集尺寸等比缩放）。
+    每个设置的逐帧判定结果与同一组画面在最大输入高度下的判定结果比较，一致的比例记为 agreement；
+    不同采集尺寸的画面不同，只比较判定结果的众数 mask。
+
+    返回值：
+    字典，可直接由 save_resolution_profile 保存；candidates 为全部测量结果。
+    """
+    captures = []
+    for size in config.RESOLUTION_CAPTURE_CANDIDATES:
+        actual, images = capture_frames(openpose.cap, size, frames)
+        # 摄像头不支持的尺寸会退回到其他尺寸，相同的实际尺寸只测量一次
+        if images and all(actual != other for other, _ in captures):
+            captures.append((actual, images))
+    if not captures:
+        raise RuntimeError("摄像头没有返回画面，无法调优")
+    # 先测量最大的采集尺寸，从参考设置得到标准坐姿
+    captures.sort(key=lambda capture: capture[0][0] * capture[0][1], reverse=True)
+
+    results = []
+    standard = None
+    for actual, images in captures:
+        heights = sorted((h for h in config.RESOLUTION_INPUT_HEIGHTS if h <= 2 * actual[1]), reverse=True)
+        size_masks = None
+        for input_height in heights:
+            result, points = measure(openpose, images, input_height)
+            if standard is None:
+                standard, reference_size = _center(points), actual
+            # 所有设置使用同一个标准坐姿判定
+            rule_engine.baseline = standard * [actual[0] / reference_size[0], actual[1] / reference_size[1]]
+            masks = rule_engine.judge_masks(points)
+            if size_masks is None:
+                size_masks = masks
+            values, counts = np.unique(masks, return_counts=True)
+            result['agreement'] = round(float(np.mean(masks == size_masks)), 4)
+            result['mask'] = int(values[counts.argmax()])
+            result['capture_size'] = list(actual)
+            results.append(result)
+            print(f"采集 {actual[0]}x{actual[1]}，输入高度 {input_height}：耗时 {result['latency_ms']} ms，"
+                  f"抖动 {result['jitter']}，与参考判定一致 {result['agreement']}")
+
+    reference = results[0]
+    chosen = min((r for r in results if acceptable(r, reference)), key=lambda r: r['latency_ms'], default=reference)
+    return {
+        'capture_size': chosen['capture_size'],
+        'input_height': chosen['input_height'],
+        'latency_ms': chosen['latency_ms'],
+        'reference': {'capture_size': reference['capture_size'], 'input_height': reference['input_height'],
+                      'latency_ms': reference['latency_ms']},
+        'created_at': time.time(),
+        'frames': frames,
+        'candidates': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='调优摄像头采集尺寸与网络输入高度')
+    parser.add_argument('--camera', type=int, default=config.CAMERA_INDEX, help='摄像头编号')
+    parser.add_argument('--frames', type=int, default=20, help='每种采集尺寸采集的帧数')
+    args = parser.parse_args()
+
+    openpose = OpenPoseWrapperclass(args.camera)
+    rule_engine = PoseRuleEngine(config.POSE_RULES_PATH)
+    try:
+        profile = tune(openpose, rule_engine, args.frames)
+    finally:
+        openpose.cap.release()
+    profile['camera_index'] = args.camera
+    save_resolution_profile(config.RESOLUTION_DIR, args.camera, profile)
+    print(f"已选择采集 {profile['capture_size'][0]}x{profile['capture_size'][1]}、输入高度 {profile['input_height']}"
+          f"（{profile['latency_ms']} ms，参考设置 {profile['reference']['latency_ms']} ms）")
+
+
+if __name__ == '__main__':
+    main()
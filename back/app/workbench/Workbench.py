@@ -1,11 +1,26 @@
 
+import os
 import threading
 from datetime import time,datetime
-from flask import Blueprint, jsonify,Flask
+from flask import Blueprint, jsonify,Flask,Response
 from ..openpose import OpenPoseWrapperclass
-from .JudgePose import is_head_tilted,is_lateral_head,is_hunchback,is_chin_supported,is_body_tilted_and_shoulders_uneven
+from .PoseRules import PoseRuleEngine
+from .Calibration import camera_geometry, load_calibration, save_calibration
+from .ResolutionTuner import load_resolution_profile
 import time
-import mysql.connector
+import atexit
+import numpy as np
+from .PostureWriter import PostureWriter
+from .PostureEpisodes import EpisodeTracker
+from .Preview import PreviewHub
+from .Governor import Governor, apply_limits
+from .Presence import PresenceGate
+from .Recording import Recorder
+from ..analyse.PostureWindow import posture_window
+from ..analyse.PoseMask import mask_to_poses
+from ..analyse.LiveStream import live_frames
+from .JudgePoseBatch import keypoints_to_array
+from config import config
 
 
 app = Flask(__name__)
@@ -13,6 +28,19 @@ app = Flask(__name__)
 # 创建路由蓝图
 workbench_blue = Blueprint('workbench', __name__)
 
+# 坐姿判定规则引擎，在检测线程启动时加载
+rule_engine = None
+# 坐姿片段异步批量写入器，首次写入时启动
+posture_writer = None
+# 把逐次检测结果合并为坐姿片段，坐姿变化时才交给写入器
+episode_tracker = None
+# 检测画面预览，只在有观看者时绘制与编码
+preview = PreviewHub(config.PREVIEW_JPEG_QUALITY)
+# 按 CPU 占用上限控制检测频率
+governor = Governor(config.DETECT_MAX_CPU_PERCENT, config.DETECT_INTERVAL)
+# 座位无人时跳过完整推理与写入
+presence = PresenceGate(config.PRESENCE_THRESHOLD, config.PRESENCE_ABSENT_CYCLES, config.PRESENCE_INPUT_HEIGHT)
+
 @workbench_blue.route('/')
 def workbench():
     with app.app_context():  # 手动创建应用上下文
@@ -22,31 +50,87 @@ def workbench():
         return jsonify({"status":"success","message":"坐姿检测已启动"})
 
 
+# 检测画面的 MJPEG 预览，可直接在浏览器或 <img> 中打开
+@workbench_blue.route('/preview')
+def preview_stream():
+    return Response(preview.stream(), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+
+# 检测线程的 CPU 占用与限流情况
+@workbench_blue.route('/governor')
+def governor_metrics():
+    return jsonify(governor.metrics())
+
+
+# 在座检测的状态与跳过的检测次数
+@workbench_blue.route('/presence')
+def presence_metrics():
+    return jsonify(presence.metrics())
+
+
 def detect_pose():
+    global rule_engine
     with app.app_context():  # 手动创建应用上下文
         from .. import socketio
 
         try:
+            # 加载坐姿判定规则
+            rule_engine = PoseRuleEngine(config.POSE_RULES_PATH)
+            # 采集尺寸与网络输入高度优先使用本机的调优结果
+            profile = load_resolution_profile(config.RESOLUTION_DIR, config.CAMERA_INDEX) or \
+                {'capture_size': config.CAPTURE_SIZE, 'input_height': config.NET_INPUT_HEIGHT}
+            # 先启动写入线程，再记录已有的线程，之后新出现的线程才是 torch 的计算线程
+            get_episode_tracker()
+            governor.track_workers()
+            # 加载模型前限制 torch 线程数、检测线程的优先级与可用的 CPU
+            apply_limits(config.DETECT_TORCH_THREADS, config.DETECT_INTEROP_THREADS, config.DETECT_NICE,
+                         config.DETECT_CPU_AFFINITY)
             # 调用OpenPose
-            openpose = OpenPoseWrapperclass()
+            openpose = OpenPoseWrapperclass(config.CAMERA_INDEX, config.HAND_MODEL_PATH,
+                                            {'input_size': config.HAND_INPUT_SIZE,
+                                             'gate_ratio': config.HAND_GATE_RATIO,
+                                             'thre': config.HAND_PEAK_THRESHOLD},
+                                            profile['capture_size'], profile['input_height'])
             ### 获取标准坐姿
-            standardPose = openpose.get_standard_pose(openpose.cap, openpose.numberToWord, num_samples=3)   # 采样次数
+            standardPose = get_standard_pose(openpose)
+            # 录制关键点序列，供调整规则后回放（见 Recording）
+            recorder = start_recorder(standardPose) if config.RECORD_ENABLED else None
 
             while True:
+                governor.begin()
                 try:
-                    #循环检测坐姿并判断
-                    keyPoints = get_keyPoints(openpose, openpose.cap)
-                    print(keyPoints)
-                    bad_poses = judge_pose(standardPose, keyPoints)
-                    print(bad_poses)
-                    # 如果有不良坐姿向前端发送信息
-                    if  bad_poses:
+                    # 规则文件有修改时重新编译，无需重启检测或重新加载模型
+                    rule_engine.maybe_reload()
+                    ret, oriImg = openpose.cap.read()
+                    # 座位无人时只做小尺寸的在座检测，不做完整推理
+                    keyPoints = None
+                    # 读到画面时至少运行了在座检测的推理
+                    inferred = ret
+                    if ret and presence.should_run(openpose.body_estimation, oriImg):
+                        #循环检测坐姿并判断
+                        keyPoints = get_keyPoints(openpose, oriImg)
+                        presence.update(bool(keyPoints))
+                    # 画面中没有人时不判定、不计入提醒窗口也不写入，坐姿片段中留下空档
+                    if keyPoints:
+                        print(keyPoints)
+                        bad_mask = judge_pose(standardPose, keyPoints)
+                        print(mask_to_poses(bad_mask))
+                        # 计入提醒用的滑动窗口，坐姿检查直接读取，无需经过数据库
+                        posture_window.add(bad_mask)
+                        points = keypoints_to_array([keyPoints])[0]
+                        # 供实时关键点推送读取，推送在 websocket 线程中按客户端速率编码发送
+                        live_frames.publish(points, bad_mask)
+                        if recorder is not None:
+                            recorder.add(time.time(), points, bad_mask)
+                        # 良好坐姿也计入片段，统计时才能区分“坐姿良好”与“未在检测”
                         # socketio.emit('alert', bad_poses)
-                        write_bad_posture_to_db(bad_poses)
+                        write_posture_to_db(bad_mask)
                         # write_bad_posture_to_json(bad_poses)
-                    # 每5秒检测一次
-                    # await sleep(5)
-                    time.sleep(3)
+                    elif recorder is not None:
+                        # 没有新帧时按时间写出内存中剩余的帧
+                        recorder.maybe_flush()
+                    # 每 DETECT_INTERVAL 秒检测一次，检测占用的 CPU 超出上限时拉长间隔
+                    governor.throttle(inferred)
 
                 except Exception as e:
                     # print(f"检测过程中出错: {str(e)}")
@@ -58,74 +142,79 @@ def detect_pose():
 
 
 
-def get_keyPoints(openpose, cap):
-    keyPoints = {}
-    ret, oriImg = cap.read()
+def get_standard_pose(openpose):
+    # 优先复用当前用户与摄像头的标定缓存，摄像头分辨率变化或缓存过期时重新标定
+    geometry = camera_geometry(openpose.cap)
+    standardPose = load_calibration(config.CALIBRATION_DIR, config.USER_ID, config.CAMERA_INDEX, geometry,
+                                    config.CALIBRATION_MAX_AGE_DAYS)
+    if standardPose:
+        print(f"使用缓存的标准坐姿: {standardPose}")
+        return standardPose
+
+    standardPose = openpose.get_standard_pose(openpose.cap, openpose.numberToWord,
+                                              num_samples=config.CALIBRATION_SAMPLES,   # 采样次数
+                                              trim=config.CALIBRATION_TRIM)
+    if standardPose:
+        save_calibration(config.CALIBRATION_DIR, config.USER_ID, config.CAMERA_INDEX, geometry, standardPose,
+                         config.CALIBRATION_SAMPLES)
+    return standardPose
+
+
+def start_recorder(standardPose):
+    # 每次启动检测写入一个新的录制文件，退出时写入内存中剩余的帧
+    path = os.path.join(config.RECORD_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-cam{config.CAMERA_INDEX}.pgrec")
+    recorder = Recorder(path, {'standard_pose': standardPose, 'user_id': config.USER_ID,
+                               'camera_index': config.CAMERA_INDEX},
+                        chunk_frames=config.RECORD_CHUNK_FRAMES, max_age=config.RECORD_FLUSH_SECONDS)
+    atexit.register(recorder.close)
+    print(f"关键点录制到 {path}")
+    return recorder
+
+
+def get_keyPoints(openpose, oriImg):
     candidate, subset = openpose.body_estimation(oriImg)
+    preview.publish(oriImg, candidate, subset)
 
-    if len(subset) > 0:
-        for i in range(18):
-            index = int(subset[0][i])
-            if index == -1:
-                continue
-            x, y = candidate[index][0:2]
-            if openpose.numberToWord[i] != '':
-                keyPoints.update({openpose.numberToWord[i]: [x, y]})
+    keyPoints = openpose.to_keypoints(candidate, subset)
+    # 手腕靠近面部时才运行手部检测，以检测到的手部关键点的中心作为手的位置，供托腮判定使用
+    if openpose.hand_estimation is not None:
+        for is_left, peaks in openpose.hand_estimation.detect(oriImg, candidate, subset):
+            found = peaks[~np.isnan(peaks[:, 0]), :2]
+            if len(found) >= config.HAND_MIN_POINTS:
+                x, y = found.mean(axis=0)
+                keyPoints.update({openpose.handToWord[is_left]: [float(x), float(y)]})
 
     return keyPoints
 
 def judge_pose(standardPose, keyPoints):
-    # 定义不良坐姿的阈值
-    bad_poses = []
-    bad_poses.extend(is_head_tilted(keyPoints))
-    bad_poses.extend(is_hunchback(keyPoints))
-    bad_poses.extend(is_body_tilted_and_shoulders_uneven(keyPoints))
-    # bad_poses.extend(is_chin_supported(keyPoints))
-    bad_poses.extend(is_lateral_head(keyPoints))
-
-    return bad_poses  # 返回不良坐姿类型列表，如果没有不良坐姿则返回空列表
-
-# 将不良坐姿数据写入数据库
-def write_bad_posture_to_db(bad_poses):
-        head_left = 1 if 'head_left' in bad_poses else 0
-        print(head_left)
-        head_right = 1 if 'head_right' in bad_poses else 0
-        print(head_right)
-        hunchback=1 if 'hunchback' in bad_poses else 0
-        print(hunchback)
-        chin_in_hands=1 if 'chin_in_hands' in bad_poses else 0
-        print(chin_in_hands)
-        body_left=1 if 'body_left' in bad_poses else 0
-        print(body_left)
-        body_right=1 if 'body_right' in bad_poses else 0
-        print(body_right)
-        neck_forward=1 if 'neck_forward' in bad_poses else 0
-        print(neck_forward)
-        shoulder_left=1 if 'shoulder_left' in bad_poses else 0
-        print(shoulder_left)
-        shoulder_right=1 if 'shoulder_right' in bad_poses else 0
-        print(shoulder_right)
-        twisted_head=1 if 'twisted_head' in bad_poses else 0
-        print(twisted_head)
-        # 连接数据库
-        conn = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="Hsj70750",
-            database="db1"
-        )
-        # 创建游标
-        cursor = conn.cursor()
-        # 执行添加
-        sql = "insert into posture_log(timestamp,head_left,head_right,hunchback,chin_in_hands,body_left,body_right,neck_forward,shoulder_left,shoulder_right,twisted_head) values(%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s);"
-        # 获取当前时间戳
-        current_time = datetime.now()
-        formatted_time = current_time.strftime("%Y%m%d%H%M%S")
-        values = (formatted_time,head_left,head_right,hunchback,chin_in_hands,body_left,body_right,neck_forward,shoulder_left,shoulder_right,twisted_head)
-        cursor.execute(sql, params=values)
-        # 提交
-        conn.commit()
-        # 关闭连接
-        cursor.close()
-        conn.close()
-
+    # 以标准坐姿为基准，按规则文件中的表达式判定，缺失关键点的规则不触发
+    rule_engine.set_baseline(standardPose)
+
+    return rule_engine.judge(keyPoints)  # 返回不良坐姿掩码（见 PoseMask），没有不良坐姿时为0
+
+# 将坐姿数据写入数据库
+def write_posture_to_db(bad_mask):
+        # 坐姿与上次相同时只延长内存中的片段，变化时由后台写入线程批量写入，检测线程不等待数据库
+        get_episode_tracker().add(int(time.time()), bad_mask)
+
+
+def get_posture_writer():
+    global posture_writer
+    if posture_writer is None:
+        posture_writer = PostureWriter(config.POSTURE_FLUSH_ROWS, config.POSTURE_FLUSH_INTERVAL_MS,
+                                       config.POSTURE_QUEUE_SIZE, config.POSTURE_SPILL_PATH)
+        posture_writer.start()
+    return posture_writer
+
+
+def get_episode_tracker():
+    global episode_tracker
+    if episode_tracker is None:
+        # 提醒从数据库查询时缩短片段，否则提醒要等到片段结束（最长 EPISODE_MAX_SECONDS 秒）才能看到最近的坐姿
+        max_seconds = config.EPISODE_MAX_SECONDS
+        if config.ALERT_SOURCE == 'db':
+            max_seconds = min(max_seconds, config.ALERT_DB_EPISODE_SECONDS)
+        episode_tracker = EpisodeTracker(get_posture_writer().write, config.EPISODE_MAX_GAP, max_seconds)
+        # 先于写入器的退出处理执行（atexit 后注册先执行），未结束的片段也会写出
+        atexit.register(episode_tracker.flush)
+    return episode_tracker
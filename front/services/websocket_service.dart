@@ -1,5 +1,6 @@
 import 'dart:async';
 import 'dart:convert';
+import 'dart:typed_data';
 import 'package:flutter/foundation.dart';
 import 'package:web_socket_channel/web_socket_channel.dart';
 import 'package:web_socket_channel/io.dart';
@@ -107,23 +108,119 @@ class WeeklySummary {
   }
 }
 
+// 实时关键点名称，顺序与后端 JudgePoseBatch.KEYPOINT_NAMES 一致
+const List<String> liveKeypointNames = [
+  'nose', 'neck', 'right_shoulder', 'left_wrist', 'left_shoulder', 'right_wrist', 'right_eye', 'left_eye',
+  'left_hand', 'right_hand',
+];
+
+// 不良坐姿类型，第 i 种对应掩码的第 i 位，与后端 PoseMask.BAD_POSES_LIST 一致
+const List<String> badPosesList = [
+  'head_left', 'head_right', 'hunchback', 'chin_in_hands', 'body_left',
+  'body_right', 'neck_forward', 'shoulder_left', 'shoulder_right', 'twisted_head',
+];
+
+// 实时关键点帧模型
+class LiveFrame {
+  final int seq;
+  final int tsMs;
+  final int mask;
+  // 关键点名称 -> [x, y]（像素），未检测到的关键点不包含在内
+  final Map<String, List<double>> keypoints;
+
+  LiveFrame({
+    required this.seq,
+    required this.tsMs,
+    required this.mask,
+    required this.keypoints,
+  });
+
+  List<String> get badPoses => [
+        for (var i = 0; i < badPosesList.length; i++)
+          if (mask & (1 << i) != 0) badPosesList[i]
+      ];
+}
+
+// 实时关键点二进制消息解码器，格式见后端 app/analyse/LiveStream.py
+// 差分帧依赖上一帧的坐标，每个连接使用一个解码器
+class LiveFrameDecoder {
+  static const int frameKey = 1;
+  static const int frameDelta = 2;
+
+  final double scale;
+  final List<int> _x = List<int>.filled(liveKeypointNames.length, 0);
+  final List<int> _y = List<int>.filled(liveKeypointNames.length, 0);
+  bool _hasKeyframe = false;
+
+  LiveFrameDecoder({this.scale = 8});
+
+  // 收到差分帧之前没有关键帧时返回 null
+  LiveFrame? decode(Uint8List bytes) {
+    final data = ByteData.sublistView(bytes);
+    final type = data.getUint8(0);
+    final seq = data.getUint16(1, Endian.little);
+    final tsMs = data.getUint32(3, Endian.little);
+    final mask = data.getUint16(7, Endian.little);
+    final present = data.getUint16(9, Endian.little);
+
+    if (type == frameKey) {
+      var offset = 11;
+      for (var i = 0; i < liveKeypointNames.length; i++) {
+        if (present & (1 << i) != 0) {
+          _x[i] = data.getInt16(offset, Endian.little);
+          _y[i] = data.getInt16(offset + 2, Endian.little);
+          offset += 4;
+        }
+      }
+      _hasKeyframe = true;
+    } else if (type == frameDelta) {
+      if (!_hasKeyframe) {
+        return null;
+      }
+      final changed = data.getUint16(11, Endian.little);
+      var offset = 13;
+      for (var i = 0; i < liveKeypointNames.length; i++) {
+        if (changed & (1 << i) != 0) {
+          _x[i] += data.getInt8(offset);
+          _y[i] += data.getInt8(offset + 1);
+          offset += 2;
+        }
+      }
+    } else {
+      return null;
+    }
+
+    final keypoints = <String, List<double>>{};
+    for (var i = 0; i < liveKeypointNames.length; i++) {
+      if (present & (1 << i) != 0) {
+        keypoints[liveKeypointNames[i]] = [_x[i] / scale, _y[i] / scale];
+      }
+    }
+    return LiveFrame(seq: seq, tsMs: tsMs, mask: mask, keypoints: keypoints);
+  }
+}
+
 // WebSocket客户端服务
 class WebSocketService {
   // WebSocket客户端
   WebSocketChannel? _channel;
   bool _isClientConnected = false;
+  // 实时关键点连接
+  WebSocketChannel? _liveChannel;
   
   // 流控制器
   final StreamController<RealtimeAdvice> _realtimeAdviceController = StreamController<RealtimeAdvice>.broadcast();
   final StreamController<DailySummary> _dailySummaryController = StreamController<DailySummary>.broadcast();
   final StreamController<WeeklySummary> _weeklySummaryController = StreamController<WeeklySummary>.broadcast();
   final StreamController<String> _logController = StreamController<String>.broadcast();
+  final StreamController<LiveFrame> _liveFrameController = StreamController<LiveFrame>.broadcast();
 
   // 获取流
   Stream<RealtimeAdvice> get realtimeAdviceStream => _realtimeAdviceController.stream;
   Stream<DailySummary> get dailySummaryStream => _dailySummaryController.stream;
   Stream<WeeklySummary> get weeklySummaryStream => _weeklySummaryController.stream;
   Stream<String> get logStream => _logController.stream;
+  Stream<LiveFrame> get liveFrameStream => _liveFrameController.stream;
   
   // 客户端状态
   bool get isClientConnected => _isClientConnected;
@@ -174,6 +271,39 @@ class WebSocketService {
     }
   }
   
+  // 连接实时关键点推送（二进制消息），与坐姿提醒使用同一端口的 /live 路径
+  Future<void> connectLive({String host = 'localhost', int port = 8765}) async {
+    await disconnectLive();
+    final uri = Uri.parse('ws://$host:$port/live');
+    final decoder = LiveFrameDecoder();
+    _liveChannel = IOWebSocketChannel.connect(uri);
+    _log('已连接到实时关键点推送: $uri');
+    _liveChannel!.stream.listen(
+      (dynamic data) {
+        if (data is List<int>) {
+          final frame = decoder.decode(data is Uint8List ? data : Uint8List.fromList(data));
+          if (frame != null) {
+            _liveFrameController.add(frame);
+          }
+        }
+      },
+      onDone: () {
+        _log('实时关键点推送已关闭');
+      },
+      onError: (error) {
+        _log('实时关键点推送错误: $error');
+      },
+    );
+  }
+
+  // 断开实时关键点推送
+  Future<void> disconnectLive() async {
+    if (_liveChannel != null) {
+      await _liveChannel!.sink.close();
+      _liveChannel = null;
+    }
+  }
+
   // 发送消息到服务器
   void sendMessage(String message) {
     if (_isClientConnected && _channel != null) {
@@ -231,11 +361,13 @@ class WebSocketService {
   // 释放资源
   Future<void> dispose() async {
     await disconnectFromServer();
+    await disconnectLive();
     
     await _realtimeAdviceController.close();
     await _dailySummaryController.close();
     await _weeklySummaryController.close();
     await _logController.close();
+    await _liveFrameController.close();
     
     _log('WebSocket服务已释放资源');
   }